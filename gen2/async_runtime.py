@@ -6,6 +6,8 @@ from dataclasses import dataclass
 from typing import Awaitable, Callable, Dict, List
 import numpy as np
 from gamma_lut import decode_srgb, encode_srgb
+from gc_control import SlackCollector
+from realtime import RealtimeMode
 
 RGBu8 = np.ndarray  # [N,3] uint8
 RGBf = np.ndarray   # [N,3] float32 (linear)
@@ -34,7 +36,10 @@ class Context:
         return self._engine.add(effect_coro)
 
 class Engine:
-    def __init__(self, num_pixels: int, *, fps: float = 60.0, frame_sink: FrameSink):
+    def __init__(self, num_pixels: int, *, fps: float = 60.0, frame_sink: FrameSink,
+                 realtime: RealtimeMode | None = None):
+        # realtime: pins, real-time schedules and locks memory for the
+        # thread that calls run() until it returns, see RealtimeMode
         self.N = int(num_pixels)
         self.fps = float(fps)
         self.frame_sink = frame_sink
@@ -43,6 +48,9 @@ class Engine:
         self._tasks: List[asyncio.Task] = []
         self._t0 = time.monotonic()
         self._stop = False
+        # set by run(gc_slack=True), stats() has its pause times
+        self.collector: SlackCollector | None = None
+        self.realtime = realtime
         # scratch buffers
         self._out_lin: RGBf = np.zeros((self.N, 3), dtype=np.float32)
         self._out_u8: RGBu8 = np.zeros((self.N, 3), dtype=np.uint8)
@@ -69,11 +77,20 @@ class Engine:
         task.add_done_callback(lambda t: self._tasks.remove(t) if t in self._tasks else None)
         return task
 
-    async def run(self, main_coro: Awaitable[None]) -> None:
+    async def run(self, main_coro: Awaitable[None], *, gc_slack: bool = False) -> None:
+        # gc_slack: no automatic garbage collection while running, collect
+        # only in the slack after each frame is sunk, see SlackCollector
         ctx = Context(self)
         main_task = asyncio.create_task(main_coro)
         target_dt = 1.0 / self.fps if self.fps > 1e-6 else 0.0
+        # Setup is inside the try, so the finally undoes whatever got done
         try:
+            if self.realtime is not None:
+                self.realtime.start()
+            if gc_slack:
+                if self.collector is None:
+                    self.collector = SlackCollector()
+                self.collector.start()
             while not self._stop:
                 t_loop = time.monotonic()
                 await asyncio.sleep(0)
@@ -81,6 +98,8 @@ class Engine:
                 self.frame_sink(frame_u8)
                 if main_task.done() and not self._tasks:
                     break
+                if self.collector is not None and gc_slack:
+                    self.collector.collect(target_dt - (time.monotonic() - t_loop))
                 if target_dt:
                     elapsed = time.monotonic() - t_loop
                     left = target_dt - elapsed
@@ -90,10 +109,22 @@ class Engine:
             for t in list(self._tasks):
                 t.cancel()
             main_task.cancel()
+            if gc_slack and self.collector is not None:
+                self.collector.stop()
+            if self.realtime is not None:
+                self.realtime.stop()
 
     def stop(self):
         self._stop = True
 
+    def stats(self) -> Dict[str, object]:
+        result: Dict[str, object] = {}
+        if self.collector is not None:
+            result['gc'] = self.collector.stats()
+        if self.realtime is not None:
+            result['realtime'] = self.realtime.stats()
+        return result
+
     def _composite_encode(self) -> RGBu8:
         # out_lin is the accumulation buffer in linear space
         out = self._out_lin
@@ -0,0 +1,138 @@
+"""
+BufferStrip, a strip that only exists in memory.
+
+It looks like a numpy buffer mode PhysicalStrip to effects and logical
+strips, but show() doesn't go anywhere, something else picks up the
+frame.  The frame can live in memory the strip doesn't own, a
+multiprocessing shared memory block for instance, and can be double
+buffered so one frame is rendered while the previous one is being sent.
+"""
+
+import numpy as np
+from rpi_ws281x import Color
+
+from pixel_buffer import new_pixel_buffer, channel_view
+from touch_tracking import TouchTrackingMixin
+
+
+class BufferStrip(TouchTrackingMixin):
+    """An in-memory stand-in for a numpy buffer mode PhysicalStrip."""
+
+    def __init__(self, width, frames=None, name=None):
+        """
+        Args:
+            width: Number of pixels
+            frames: Optional sequence of uint32 arrays of width pixels to
+                render into, used in turn by flip().  If None the strip
+                allocates a single frame of its own.
+            name: Optional name, used in statistics
+        """
+        self.width = width
+        self.name = name
+        self.background = new_pixel_buffer(width)
+
+        if frames is None:
+            frames = (new_pixel_buffer(width),)
+        self.frames = frames
+        self.frame_index = 0
+        self.frame = frames[0]
+
+        # Set by show(), so whoever owns the strip knows to send it
+        self.shown = False
+
+    def flip(self):
+        """
+        Make the next frame buffer current, carrying the current pixels
+        over so strips that only draw part of the frame stay correct.
+        """
+        if len(self.frames) == 1:
+            return
+        index = (self.frame_index + 1) % len(self.frames)
+        np.copyto(self.frames[index], self.frame)
+        self.frame_index = index
+        self.frame = self.frames[index]
+
+    def numPixels(self):
+        return self.width
+
+    def blackout(self):
+        """Blackout all the pixels in the background array and the frame."""
+        self.set_background()
+        self.copy_background_to_strip()
+        self.show()
+
+    @property
+    def background_u8(self):
+        """
+        An (N, 4) uint8 view of the background buffer, no copy.
+        Byte columns are B, G, R, W on the Pi.
+        """
+        return channel_view(self.background)
+
+    def set_background(self, r=0, g=0, b=0):
+        """Set all background pixels to a specific color."""
+        self.background.fill(Color(r, g, b))
+        self._touch_all()
+
+    def copy_background_to_strip(self):
+        """Copy the background buffer to the frame."""
+        self._touch_all()
+        self.frame[:] = self.background
+
+    def copy_color_to_strip(self, r=0, g=0, b=0):
+        """Fill the frame with a specific color."""
+        self._touch_all()
+        self.frame.fill(Color(r, g, b))
+
+    def setPixelColor(self, n, color):
+        """Set a pixel color in the frame being rendered."""
+        self.frame[n] = color
+        if self.touched is not None:
+            self.touched.append(n)
+
+    def getPixelColor(self, n):
+        """Get a pixel color from the frame being rendered."""
+        return int(self.frame[n])
+
+    def show(self):
+        """Mark the frame as ready to send."""
+        self.shown = True
+
+    def physical_strips(self):
+        """Return the strips this strip shows on, which is just itself."""
+        return (self,)
+
+    def __getitem__(self, key):
+        """
+        Get pixel color(s) from the strip's background buffer.
+        Supports single index and slice notation.
+        """
+        if isinstance(key, int):
+            if key < 0:
+                key = self.width + key
+            if key < 0 or key >= self.width:
+                raise IndexError(f"Pixel index {key} out of range")
+            return self.background[key]
+        elif isinstance(key, slice):
+            return self.background[key]
+        else:
+            raise TypeError(f"Invalid index type: {type(key)}")
+
+    def __setitem__(self, key, color):
+        """
+        Set pixel color(s) in the frame and the background.
+        Supports single index and slice notation.
+        """
+        if isinstance(key, int):
+            if key < 0:
+                key = self.width + key
+            if key < 0 or key >= self.width:
+                raise IndexError(f"Pixel index {key} out of range")
+            if self.touched is not None:
+                self.touched.append(key)
+        elif isinstance(key, slice):
+            self._touch_range(*key.indices(self.width))
+        else:
+            raise TypeError(f"Invalid index type: {type(key)}")
+        self.frame[key] = color
+        self.background[key] = color
@@ -0,0 +1,106 @@
+"""
+The clock the Dispatcher and effects tell time by.
+
+Every time read in the frame loop and the effects goes through now(), and
+every wait through sleep(), so swapping the clock changes what a show
+runs against:
+
+    MonotonicClock  real time that wall clock steps and NTP can't move,
+                    the default
+    ManualClock     time that only moves when told to, sleeping just
+                    advances it, so a show renders headless at CPU speed
+                    for baking or tests
+    ExternalClock   time read from something else, an audio player's
+                    sample position say, so the show stays locked to it
+
+Dispatcher(time_source=...) installs a clock when it runs, set_clock()
+does the same for code that runs effects some other way.
+"""
+
+import threading
+import time
+
+
+class MonotonicClock:
+    """Real time on time.monotonic()."""
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class ManualClock:
+    """A clock that only moves when advanced, sleeping advances it instantly."""
+
+    def __init__(self, start=0.0):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def now(self):
+        return self._now
+
+    def set(self, seconds):
+        """Set the clock to seconds."""
+        with self._lock:
+            self._now = seconds
+
+    def advance(self, seconds):
+        """Move the clock forward by seconds."""
+        with self._lock:
+            self._now += seconds
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.advance(seconds)
+
+
+class ExternalClock:
+    """
+    Time read from an outside source, an audio player's position for
+    instance.  Sleeps are real, the source is assumed to move on by itself.
+    """
+
+    def __init__(self, source, rate=1.0):
+        """
+        Args:
+            source: Callable returning the source's current position
+            rate: Source units per second, 48000 for a sample position at
+                48kHz say
+        """
+        self.source = source
+        self.rate = rate
+
+    def now(self):
+        return self.source() / self.rate
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+_clock = MonotonicClock()
+
+
+def now():
+    """Return the current time in seconds on the installed clock."""
+    return _clock.now()
+
+
+def sleep(seconds):
+    """Wait for seconds on the installed clock."""
+    _clock.sleep(seconds)
+
+
+def get_clock():
+    """Return the installed clock."""
+    return _clock
+
+
+def set_clock(clock):
+    """Install clock as the one everything tells time by, return the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
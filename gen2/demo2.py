@@ -44,9 +44,6 @@ def run_demo(strip):
         lambda: dispatcher.run_background_effect(timeline.wipe3.start(r=0, g=20, b=100, duration=3.0)),
         lambda: dispatcher.run_background_effect(timeline.fade.start(r=20, g=0, b=20, duration=3.0)),
     ])
-    # The Chain effect itself needs to be passed to the dispatcher so it can be tracked.
-    # We pass the Chain's start method as the scheduled action.
-    wipe_chain.dispatcher = dispatcher
     dispatcher.schedule(0.0, lambda: dispatcher.run_background_effect(wipe_chain.start()))
 
 
@@ -56,7 +53,7 @@ def run_demo(strip):
     ))
 
     # 14.0s: Blackout before pulses
-    dispatcher.schedule(14.0, lambda: strip.blackout())
+    dispatcher.schedule(14.0, lambda: dispatcher.blackout(strip))
 
     # 14.5s: First pulse
     dispatcher.schedule(14.5, lambda: dispatcher.run_foreground_effect(
@@ -64,7 +61,7 @@ def run_demo(strip):
     ))
 
     # 17.0s: Blackout
-    dispatcher.schedule(17.0, lambda: strip.blackout())
+    dispatcher.schedule(17.0, lambda: dispatcher.blackout(strip))
 
     # 17.5s: Second pulse
     dispatcher.schedule(17.5, lambda: dispatcher.run_foreground_effect(
@@ -72,7 +69,7 @@ def run_demo(strip):
     ))
 
     # 20.0s: Blackout
-    dispatcher.schedule(20.0, lambda: strip.blackout())
+    dispatcher.schedule(20.0, lambda: dispatcher.blackout(strip))
 
     # 20.5s: Sparkles for 5 seconds
     dispatcher.schedule(20.5, lambda: dispatcher.run_foreground_effect(
@@ -80,7 +77,7 @@ def run_demo(strip):
     ))
 
     # 26.0s: Blackout
-    dispatcher.schedule(26.0, lambda: strip.blackout())
+    dispatcher.schedule(26.0, lambda: dispatcher.blackout(strip))
 
     # 26.5s: Two chases and sparkles running together for 10s
     dispatcher.schedule(26.5, lambda: dispatcher.run_foreground_effect(
@@ -94,7 +91,7 @@ def run_demo(strip):
     ))
 
     # 37.0s: Final blackout
-    dispatcher.schedule(37.0, lambda: strip.blackout())
+    dispatcher.schedule(37.0, lambda: dispatcher.blackout(strip))
 
     # --- Run the animation ---
     # The dispatcher will now run until all scheduled events and effects are complete.
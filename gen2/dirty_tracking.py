@@ -0,0 +1,67 @@
+"""
+Dirty tracking for physical strips.
+
+A physical strip remembers a cheap digest of what it last sent to the
+wire, so the commit stage can skip show() when a frame comes out
+identical to the one already latched by the LEDs.  Because the digest
+is taken in show() itself, shows done outside the frame loop (a
+blackout, say) are tracked too.
+"""
+
+import time
+import zlib
+
+
+class DirtyTrackingMixin:
+    """
+    Mixin for physical strip classes.  The class provides wire_pixels()
+    and wire_brightness(), this provides the digest, the show-if-changed
+    logic and the per-strip sent/skipped counters.
+    """
+
+    # Digest of the last frame sent to the wire, None if unknown
+    sent_digest = None
+
+    # time.monotonic() of the last transmit, for keepalive resends
+    sent_at = 0.0
+
+    frames_sent = 0
+    frames_skipped = 0
+
+    def frame_digest(self, pixels=None):
+        """
+        Return a digest of what show() would put on the wire right now,
+        or of pixels if given, or None if the pixels can't be read back.
+        """
+        if pixels is None:
+            pixels = self.wire_pixels()
+        if pixels is None:
+            return None
+        return zlib.crc32(pixels), self.wire_brightness()
+
+    def show_if_changed(self, keepalive=None, pixels=None):
+        """
+        Show the strip unless the frame is identical to the last one sent.
+        keepalive: if set, resend an unchanged frame anyway once this many
+        seconds have passed since the last transmit, for installs where
+        noise can corrupt latched pixels.
+        pixels: send this uint32 pixel array instead of the strip's frame
+        Returns True if the strip was sent.
+        """
+        digest = self.frame_digest(pixels)
+        if digest is not None and digest == self.sent_digest:
+            if keepalive is None or time.monotonic() - self.sent_at < keepalive:
+                self.frames_skipped += 1
+                return False
+        self._transmit(digest, pixels)
+        return True
+
+    def show_pixels(self, pixels):
+        """Send a uint32 pixel array to the wire in place of the strip's frame."""
+        self._transmit(self.frame_digest(pixels), pixels)
+
+    def _mark_sent(self, digest):
+        """Record a transmit of a frame with the given digest."""
+        self.sent_digest = digest
+        self.sent_at = time.monotonic()
+        self.frames_sent += 1
@@ -1,10 +1,22 @@
+import json
 import time
 import math
-import random
 import heapq
+from operator import itemgetter
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
 from rpi_ws281x import Color
 from image_stuff import load_and_resize_image, get_row_pixels, list_image_files
+import clock
+from clock import set_clock
+from event_queue import EventQueue
+from frame_budget import FrameBudget
+from frame_commit import FrameCommit, physical_strips_of
+from frame_pacing import AdaptivePacer, FramePacer
+from frame_pipeline import FramePipeline
+from frame_stats import FrameStats, RollingHistogram
+from gc_control import SlackCollector
+from show_random import ShowSeed, unseeded_rng
 
 
 class Timeline:
@@ -12,28 +24,139 @@ class Timeline:
     pass
 
 
+# While the Dispatcher runs a scheduled action, or the completion
+# callbacks of an effect that ran its course, the clock time that was
+# meant to happen at.  Effects started meanwhile take it as their
+# start time, so they run from the scheduled instant rather than
+# whenever the frame loop got round to it, and chained effects don't
+# pile up a frame of lateness per link.
+_intended_start = None
+
+
+def _start_clock():
+    """Return the start time for an effect starting now."""
+    if _intended_start is not None:
+        return _intended_start
+    return clock.now()
+
+
+def _call_at(start, function, *args):
+    """Call function(*args) with effects it starts starting at start."""
+    global _intended_start
+    previous = _intended_start
+    _intended_start = start
+    try:
+        return function(*args)
+    finally:
+        _intended_start = previous
+
+
 class Effect(ABC):
     """Base class for all effects."""
 
+    # How the effect degrades when the Dispatcher's frames run over
+    # budget, see set_priority()
+    priority = 0
+    optional = False
+    cost_budget = None
+    # Smoothed seconds per step(), measured for effects with a cost_budget
+    step_cost = 0.0
+
     def __init__(self, strip):
         self.strip = strip
         self.width = strip.width
         self.pause_until = 0
         self.pause_started_at = 0
 
+        # The effect's own random number stream, a numpy Generator seeded
+        # from the OS until a seeded Dispatcher runs it, see show_random
+        self.rng = unseeded_rng()
+        self.seeded_by = None
+
+        # Completion - set and fired by the dispatcher when the effect ends
+        self.done = False
+        self._done_callbacks = []
+        self._future = None
+
     def start(self, **kwargs):
-        """Start the effect with given parameters."""
-        self.start_time = time.time()
+        """
+        Start the effect with given parameters.  Started from a scheduled
+        action, or when another effect completes, it starts at the
+        instant that was due rather than now.
+        """
+        self.start_time = _start_clock()
+        self.done = False
+        if self._future is not None and self._future.done():
+            self._future = None
         self.init(**kwargs)
         return self
 
+    def on_complete(self, callback):
+        """
+        Call callback(effect) as soon as the effect finishes, in the same
+        frame its step() returns False or when it is stopped.  Callbacks
+        fire once, for the next completion.
+        Returns the effect, so it can go in line with start().
+        """
+        self._done_callbacks.append(callback)
+        return self
+
+    def set_priority(self, priority=0, optional=False, cost_budget=None):
+        """
+        Say how the effect should give way when frames run over the
+        Dispatcher's frame_budget.
+
+        Args:
+            priority: Effects below 0 are low priority, stepped less often
+                while frames are over budget
+            optional: A foreground effect that can be left out altogether
+                if stepping low priority effects less often isn't enough
+            cost_budget: Seconds a step() is expected to take.  While its
+                steps take longer the effect counts as low priority.
+        Returns the effect, so it can go in line with start().
+        """
+        self.priority = priority
+        self.optional = optional
+        self.cost_budget = cost_budget
+        return self
+
+    def future(self):
+        """
+        Return a concurrent.futures.Future that resolves to the effect when
+        it finishes.  From asyncio, await asyncio.wrap_future(effect.future()).
+        """
+        if self._future is None:
+            self._future = Future()
+            if self.done:
+                self._future.set_result(self)
+        return self._future
+
+    def seed(self, show_seed):
+        """Draw from show_seed's stream for this effect from now on.  Called by the dispatcher."""
+        self.rng = show_seed.effect_rng(type(self).__name__)
+        self.seeded_by = show_seed
+
+    def complete(self):
+        """Mark the effect finished and fire its completion callbacks.  Called by the dispatcher."""
+        if self.done:
+            return
+        self.done = True
+        callbacks, self._done_callbacks = self._done_callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Error in completion callback: {callback}\n{e}")
+        if self._future is not None and not self._future.done():
+            self._future.set_result(self)
+
     def request_pause(self, duration):
         """
         Request a pause for this effect.
         The dispatcher will not step this effect until the pause is over.
         The effect's elapsed time will not advance during the pause.
         """
-        now = time.time()
+        now = clock.now()
         self.pause_until = now + duration
         self.pause_started_at = now
 
@@ -51,6 +174,24 @@ class Effect(ABC):
         """
         pass
 
+    def next_change(self, elapsed_time):
+        """
+        Return the elapsed time at which the effect's output will next
+        change, given the step() just made at elapsed_time, or None if it
+        may change on any frame.  The dispatcher doesn't step a background
+        effect that is alone on its strip again until then.
+        """
+        return None
+
+    def seek(self, elapsed_time):
+        """
+        Called when the dispatcher jumps into the middle of the effect,
+        before it is next stepped at about elapsed_time.  Effects drawn
+        purely from the elapsed time need do nothing, effects that build
+        up state step by step should set it up as it would be by then.
+        """
+        pass
+
     @staticmethod
     def unpack_color(color):
         """Unpack a 32-bit color into (r, g, b) components."""
@@ -137,10 +278,28 @@ class Effect(ABC):
 class BackgroundEffect(Effect):
     """Base class for effects that modify background values."""
 
+    # True if every step() writes every pixel of the background, so any
+    # background effect started earlier on the same strip can't be seen
+    # and the dispatcher doesn't bother stepping it
+    opaque = False
+
     def __init__(self, strip):
         super().__init__(strip)
         self.background = strip.background
 
+    def skip(self, elapsed_time):
+        """
+        Advance the effect without drawing, because a later opaque effect
+        hides it this frame.  Return True if still active, False if
+        complete, or None if the effect can't be skipped and has to be
+        stepped.  By default an effect with a duration is done once it
+        has run that long.
+        """
+        duration = getattr(self, 'duration', None)
+        if duration is None:
+            return None
+        return elapsed_time < duration
+
 
 class ForegroundEffect(Effect):
     """Base class for effects that modify foreground pixels."""
@@ -148,7 +307,10 @@ class ForegroundEffect(Effect):
 
 
 class Chain(Effect):
-    """An effect that runs a sequence of other effects."""
+    """
+    An effect that runs a sequence of other effects, each one starting in
+    the frame the one before it finishes.
+    """
 
     def __init__(self, strip, effects):
         super().__init__(strip)
@@ -166,92 +328,820 @@ class Chain(Effect):
         self._run_next_effect()
         return self
 
-    def _run_next_effect(self):
-        """Runs the next effect in the chain."""
-        if self.effects:
-            self.current_effect = self.effects.pop(0)
+    def _run_next_effect(self, finished=None):
+        """Runs the next effect in the chain, called back when the current one completes."""
+        while self.effects:
             # The "effects" in the list are actually pre-configured start calls
-            # e.g. lambda: some_effect.start(duration=2.0)
-            self.current_effect()
-        else:
-            self.current_effect = None
+            # that return the running effect,
+            # e.g. lambda: dispatcher.run_background_effect(some_effect.start(duration=2.0))
+            effect = self.effects.pop(0)()
+            if isinstance(effect, Effect) and not effect.done:
+                self.current_effect = effect
+                effect.on_complete(self._run_next_effect)
+                return
+            # Not an effect, a blackout say, carry straight on
+        self.current_effect = None
 
     def step(self, elapsed_time):
         """
         The chain's step is a bit different. It just needs to know when the
-        entire sequence is done. It relies on the dispatcher to step the
-        actual active effect. The chain is "done" when there are no more
-        effects to run and the current one is no longer in the dispatcher's
-        active list.
+        entire sequence is done.  The dispatcher steps the actual active
+        effect and tells the chain when it completes, so there is nothing
+        to check here.
         """
-        if self.current_effect:
-            # Check if the current effect has finished
-            if self.current_effect not in self.dispatcher.background_effects and \
-               self.current_effect not in self.dispatcher.foreground_effects:
-                self._run_next_effect()
-
         # The chain is active as long as it has a current effect or more to run
         return self.current_effect is not None
 
 
+class Sleep:
+    """
+    Returned from an effect's step(), or yielded or awaited by a
+    GeneratorEffect, to sleep for a number of seconds.  The dispatcher
+    parks a sleeping effect and doesn't step it at all until it is due.
+    Unlike request_pause(), the effect's elapsed time keeps running.
+    """
+
+    __slots__ = ('seconds',)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __await__(self):
+        yield self
+
+
+class NextFrame:
+    """Awaited by a coroutine GeneratorEffect to wait for the next frame."""
+
+    __slots__ = ()
+
+    def __await__(self):
+        yield None
+
+
+class GeneratorEffect(Effect):
+    """
+    Base class for effects written as a generator or a coroutine instead
+    of a step() function.
+
+    Override run(**kwargs), which start() is called with.  As a generator
+    it yields None to wait for the next frame or Sleep(seconds) to sleep.
+    As an async def it awaits self.next_frame() or self.sleep(seconds).
+    self.elapsed is the effect's elapsed time each time it resumes.  The
+    effect completes when run() returns.
+
+        class Blink(ForegroundEffect, GeneratorEffect):
+            def run(self, color, times=3):
+                for _ in range(times):
+                    self.strip[0] = color
+                    yield Sleep(0.5)
+                    yield
+
+    To pass a routine in rather than overriding run(), see RoutineEffect.
+    """
+
+    def __init__(self, strip):
+        super().__init__(strip)
+        self.elapsed = 0.0
+        self._routine = None
+
+    def init(self, **kwargs):
+        self.elapsed = 0.0
+        self._routine = self.run(**kwargs)
+
+    @abstractmethod
+    def run(self, **kwargs):
+        """Return the effect's generator or coroutine. Override in subclasses."""
+        pass
+
+    def step(self, elapsed_time):
+        """Resume the routine until it waits again."""
+        self.elapsed = elapsed_time
+        try:
+            return self._routine.send(None) or True
+        except StopIteration:
+            return False
+
+    @staticmethod
+    def sleep(seconds):
+        """Awaitable sleep for coroutine routines."""
+        return Sleep(seconds)
+
+    @staticmethod
+    def next_frame():
+        """Awaitable wait for the next frame, for coroutine routines."""
+        return NextFrame()
+
+
+class RoutineEffect(GeneratorEffect):
+    """
+    A GeneratorEffect running a routine passed in, called as
+    routine(effect, **kwargs) with the kwargs start() is called with.
+    """
+
+    def __init__(self, strip, routine):
+        super().__init__(strip)
+        self.routine = routine
+
+    def run(self, **kwargs):
+        return self.routine(self, **kwargs)
+
+
+def _step_effect(effect, elapsed):
+    """Step an effect, the untimed counterpart of FrameStats.timed_step."""
+    return effect.step(elapsed)
+
+
+def _copy_background(strip):
+    strip.copy_background_to_strip()
+
+
+def _copy_color(strip):
+    strip.copy_color_to_strip()
+
+
 class Dispatcher:
     """Manages the animation loop for effects across multiple strips."""
 
-    def __init__(self, fps=100):
+    # Wake effects this many seconds before their next_change() hint, so
+    # rounding in the effect's own arithmetic can't make them a frame late
+    HINT_SLACK = 1e-6
+
+    # How quickly an effect's measured step_cost follows its step times
+    COST_SMOOTHING = 0.1
+
+    def __init__(self, fps=100, skip_unchanged=True, keepalive=None,
+                 pacing='sleep', overrun='drop', instrument=False,
+                 parallel_transmit=False, pipeline_depth=0, min_fps=None,
+                 frame_budget=None, time_source=None, seed=None, realtime=None):
+        """
+        Args:
+            fps: Target frame rate, with adaptive pacing the maximum
+            skip_unchanged: Don't retransmit strips whose pixels haven't
+                changed since they were last sent
+            keepalive: Resend unchanged strips anyway every this many
+                seconds, for electrically noisy installs (None for never)
+            pacing: 'sleep' sleeps whatever is left of frame_time after
+                each frame.  'deadline' sleeps to absolute per-frame
+                deadlines on the show clock, see FramePacer.
+                'adaptive' runs at fps while the strips are changing,
+                drops towards min_fps while they aren't, and sleeps
+                through to the next scheduled event or effect wakeup
+                when nothing is animating, see AdaptivePacer.
+            overrun: With deadline pacing, 'drop' or 'resync' when a frame
+                runs past its deadline
+            instrument: Time every effect step, background copy and show
+                and keep p50/p99/max histograms of them, see stats()
+            parallel_transmit: Send all the physical strips of a frame at
+                once, one thread per strip, so the frame takes the slowest
+                strip's wire time instead of the sum
+            pipeline_depth: If non-zero, render up to this many frames
+                ahead and send them on schedule from a transmit thread, so
+                a slow frame doesn't stutter.  Needs numpy buffer mode
+                strips.  The pipeline does its own pacing, so pacing and
+                overrun don't apply.  See FramePipeline.
+            min_fps: With adaptive pacing, the slowest frame rate while
+                anything is animating, defaults to a tenth of fps
+            frame_budget: If set, seconds a frame's render and commit may
+                take.  While frames run over, low priority effects are
+                stepped less often and then optional foreground effects
+                dropped, until there is headroom again.  See FrameBudget
+                and Effect.set_priority().
+            time_source: Clock for the show and its effects to run on.
+                The default is monotonic real time, a ManualClock renders
+                as fast as the CPU allows and an ExternalClock follows an
+                audio player, say.  The clock is process-global, effects
+                tell time with clock.now(), so it is installed with
+                clock.set_clock() when run() starts, and two Dispatchers
+                running at once share one.  Effects started before run()
+                tell time by whatever clock is installed then.
+            seed: Show seed for the random number streams of the effects
+                this Dispatcher runs, so controllers running the same show
+                render the same frames.  Each effect's stream is picked
+                the first time it is run.  See show_random.
+            realtime: A RealtimeMode to run the frame and transmit threads
+                under, pinned to cores, real-time scheduled and with memory
+                locked as far as the process is permitted.  Applied when
+                run() starts and undone when it returns or raises.  The
+                first run() measures wakeup latency before and after, 0.2 s
+                by default, and stats()['realtime'] reports it.
+        """
+        self.time_source = time_source
+        if pacing not in ('sleep', 'deadline', 'adaptive'):
+            raise ValueError(f"Unknown pacing {pacing!r}, expected 'sleep', 'deadline' or 'adaptive'")
+
         self.fps = fps
         self.frame_time = 1.0 / fps
+        if pacing == 'deadline':
+            self.pacer = FramePacer(fps, overrun=overrun)
+        elif pacing == 'adaptive':
+            self.pacer = AdaptivePacer(min_fps or fps / 10, fps)
+        else:
+            self.pacer = None
 
-        # Active effects
-        self.background_effects = []
-        self.foreground_effects = []
+        # Active effects.  Dicts used as ordered sets, effects composite
+        # in the order they were started and stop in constant time.  The
+        # values are start sequence numbers, so effects coming back from
+        # the wake heap can be put back in order.
+        self.background_effects = {}
+        self.foreground_effects = {}
+        self._started = 0
+
+        # Where the effects' random number streams come from, or None
+        self.show_seed = ShowSeed(seed) if seed is not None else None
 
         # Timing
         self.frame_count = 0
         self.start_time = None
-        self.event_queue = []
-        self.schedule_count = 0
-
-    def schedule(self, fire_time, action):
+        self.event_queue = EventQueue()
+
+        # How late scheduled actions ran, overall and by label
+        self.event_lateness = RollingHistogram()
+        self.action_lateness = {}
+
+        # Sleeping, paused and unchanging effects, parked until they are
+        # due.  A heap of (wake time, sequence, effect), the effect's
+        # active set, sequence, start order and whether its strip is
+        # cleared meanwhile by effect, how many parked background effects
+        # each strip has, since their backgrounds still need copying, and
+        # how many paused foreground effects, since theirs get cleared.
+        self._sleepers = []
+        self._parked = {}
+        self._parked_strips = {}
+        self._cleared_strips = {}
+        self._park_count = 0
+
+        # Background effect steps skipped on their next_change() hints
+        self.hinted_sleeps = 0
+
+        # Background effect steps skipped because they were hidden, and
+        # low priority effect steps skipped because frames were over budget
+        self.culled_steps = 0
+        self.throttled_steps = 0
+
+        # Collects garbage between frames while run(gc_slack=True) runs
+        self.collector = None
+
+        # Whole strip fills queued for the next frame, (r, g, b) by strip,
+        # or None for a strip whose background just needs showing
+        self._fills = {}
+
+        # Sparse repaint state.  The strip that last repainted each
+        # physical strip, and what each strip was last fully repainted
+        # with, 'background' or 'color'.  A strip that still owns all its
+        # physical strips only needs the pixels drawn since put back.
+        self._owners = {}
+        self._baselines = {}
+        self.sparse_restores = 0
+
+        # Real-time scheduling for the frame and transmit threads, or None
+        self.realtime = realtime
+        on_thread_start = realtime.transmit_thread_started if realtime is not None else None
+
+        # Output - shows each physical strip at most once per frame
+        self.frame_commit = FrameCommit(skip_unchanged=skip_unchanged, keepalive=keepalive,
+                                        parallel=parallel_transmit,
+                                        on_thread_start=on_thread_start)
+
+        # Timing instrumentation, None when turned off
+        self.frame_stats = FrameStats(labels=self.frame_commit.labels) if instrument else None
+
+        # Render-ahead output, None when frames are shown as they are rendered
+        self.pipeline = None
+        if pipeline_depth:
+            self.pipeline = FramePipeline(self.frame_commit, fps, depth=pipeline_depth,
+                                          stats=self.frame_stats,
+                                          on_thread_start=on_thread_start)
+
+        # Degradation under load, None when frames take as long as they take.
+        # Optional foreground effects dropped meanwhile, by start order.
+        self.budget = FrameBudget(frame_budget) if frame_budget else None
+        self._dropped = {}
+        self._render_count = 0
+
+    def schedule(self, fire_time, action, label=None):
         """
         Schedule an action to run at a specific time.
         fire_time: virtual time in seconds to run the action.
         action: A callable (e.g., a function or lambda) to execute.
+        label: Name to keep lateness statistics under, default the
+            action's qualified name
+        Returns a ScheduledEvent whose cancel() unschedules the action.
+        Effects the action starts start at fire_time, even though the
+        action only runs at the start of the first frame after it.
         """
-        entry = (fire_time, self.schedule_count, action)
-        heapq.heappush(self.event_queue, entry)
-        self.schedule_count += 1
+        return self.event_queue.push(fire_time, action, label=label)
+
+    def every(self, interval, action, start=None, count=None, label=None):
+        """
+        Schedule an action to run repeatedly.
+        interval: seconds between runs
+        action: A callable (e.g., a function or lambda) to execute.
+        start: virtual time of the first run, default one interval from
+            the current virtual time
+        count: stop after this many runs, or run until cancelled if None
+        label: Name to keep lateness statistics under, see schedule()
+        Returns a ScheduledEvent whose cancel() stops the runs.  Runs
+        missed because a frame ran long are skipped, not bunched up.
+        While it is pending the event keeps run() going.
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval must be positive, got {interval}")
+        if start is None:
+            start = self.virtual_time() + interval
+        return self.event_queue.push(start, action, interval=interval, count=count, label=label)
+
+    def virtual_time(self):
+        """Return the current virtual time, 0 before run() starts."""
+        if self.start_time is None:
+            return 0.0
+        return clock.now() - self.start_time
+
+    def run_events(self, virtual_now, now=None):
+        """
+        Run every scheduled action that is due at virtual_now.
+        now: The clock time that corresponds to virtual_now, by default
+            worked out from the start time.  Effects the actions start get
+            the clock time of their fire time.
+        """
+        if now is None:
+            now = clock.now() + (virtual_now - self.virtual_time())
+        for fire_time, event in self.event_queue.pop_due(virtual_now):
+            lateness = virtual_now - fire_time
+            event.lateness = lateness
+            self.event_lateness.add(lateness)
+            history = self.action_lateness.get(event.label)
+            if history is None:
+                history = self.action_lateness[event.label] = RollingHistogram()
+            history.add(lateness)
+
+            try:
+                _call_at(now - lateness, event.action)
+            except Exception as e:
+                print(f"Error executing scheduled action: {event.action}\n{e}")
+
+    def is_active(self):
+        """Return True if there are effects running, fills not yet shown or events still to come."""
+        return bool(self.background_effects or self.foreground_effects or self._parked
+                    or self._dropped or self._fills or self.event_queue)
+
+    def fill(self, strip, r=0, g=0, b=0):
+        """
+        Fill a strip's background and pixels with a color at the start of
+        the next frame, so it goes out with that frame's show() rather
+        than one of its own.  Several fills of a strip before the frame
+        merge into the last one.
+        """
+        self._fills[strip] = (r, g, b)
+
+    def blackout(self, strip):
+        """Black out a strip at the start of the next frame, see fill()."""
+        self.fill(strip)
+
+    def _seed(self, effect):
+        """Give an effect its stream under the show seed, the first time it is run."""
+        if self.show_seed is not None and effect.seeded_by is not self.show_seed:
+            effect.seed(self.show_seed)
 
     def run_background_effect(self, effect):
-        """Add a background effect to the active list."""
-        self.background_effects.append(effect)
+        """Add a background effect to the active set."""
+        if effect not in self.background_effects:
+            self._seed(effect)
+            self._started += 1
+            self.background_effects[effect] = self._started
         return effect
 
     def run_foreground_effect(self, effect):
-        """Add a foreground effect to the active list."""
-        self.foreground_effects.append(effect)
+        """Add a foreground effect to the active set."""
+        if effect not in self.foreground_effects and effect not in self._dropped:
+            self._seed(effect)
+            self._started += 1
+            if effect.optional and self.budget is not None and self.budget.level >= FrameBudget.DROP_LEVEL:
+                # Frames are over budget, it waits until there's room
+                self._dropped[effect] = self._started
+                self._cleared_strips[effect.strip] = self._cleared_strips.get(effect.strip, 0) + 1
+            else:
+                self.foreground_effects[effect] = self._started
         return effect
 
     def stop_background_effect(self, effect):
-        """Remove a background effect from the active list."""
+        """Remove a background effect from the active set, completing it."""
         if effect in self.background_effects:
-            self.background_effects.remove(effect)
+            del self.background_effects[effect]
+            effect.complete()
+        elif effect in self._parked and self._parked[effect][0] is self.background_effects:
+            self._unpark(effect)
+            effect.complete()
 
     def stop_foreground_effect(self, effect):
-        """Remove a foreground effect from the active list."""
+        """Remove a foreground effect from the active set, completing it."""
         if effect in self.foreground_effects:
-            self.foreground_effects.remove(effect)
+            del self.foreground_effects[effect]
+            effect.complete()
+        elif effect in self._parked and self._parked[effect][0] is self.foreground_effects:
+            self._unpark(effect)
+            effect.complete()
+        elif effect in self._dropped:
+            del self._dropped[effect]
+            self._uncount(self._cleared_strips, effect.strip)
+            effect.complete()
+
+    def _park(self, effect, active, wake_time, cleared=False):
+        """
+        Take an effect out of its active set until wake_time.  If cleared,
+        a foreground effect's strip is cleared every frame meanwhile, as
+        it would be for a paused effect that is still in the set.
+        """
+        if effect not in active:
+            # Stopped during its own step
+            return
+        order = active.pop(effect)
+        self._park_count += 1
+        self._parked[effect] = (active, self._park_count, order, cleared)
+        heapq.heappush(self._sleepers, (wake_time, self._park_count, effect))
+        if active is self.background_effects:
+            counts = self._parked_strips
+        elif cleared:
+            counts = self._cleared_strips
+        else:
+            return
+        counts[effect.strip] = counts.get(effect.strip, 0) + 1
+
+    def _unpark(self, effect):
+        """Forget a parked effect, return the active set it came from."""
+        active, _, _, cleared = self._parked.pop(effect)
+        if active is self.background_effects:
+            self._uncount(self._parked_strips, effect.strip)
+        elif cleared:
+            self._uncount(self._cleared_strips, effect.strip)
+        return active
+
+    @staticmethod
+    def _uncount(counts, strip):
+        count = counts[strip] - 1
+        if count:
+            counts[strip] = count
+        else:
+            del counts[strip]
+
+    def _wake_effects(self, now):
+        """
+        Put the parked effects that are due back in their active sets, in
+        the order they were started so they still composite the same way.
+        """
+        sleepers = self._sleepers
+        unsorted = {}
+        while sleepers and sleepers[0][0] <= now:
+            _, sequence, effect = heapq.heappop(sleepers)
+            parked = self._parked.get(effect)
+            if parked is None or parked[1] != sequence:
+                # Stopped, or stopped and parked again, since
+                continue
+            order = parked[2]
+            active = self._unpark(effect)
+            if active and order < next(reversed(active.values())):
+                unsorted[id(active)] = active
+            active[effect] = order
+
+        for active in unsorted.values():
+            self._sort_active(active)
+
+    @staticmethod
+    def _finish(effect, now):
+        """
+        Complete an effect that ran its course by now.  If it has a
+        duration, effects its callbacks start (the next link of a Chain,
+        say) start when it was due to end, not at this frame.
+        """
+        end = now
+        duration = getattr(effect, 'duration', None)
+        if isinstance(duration, (int, float)) and 0 <= duration <= now - effect.start_time:
+            end = effect.start_time + duration
+        _call_at(end, effect.complete)
+
+    @staticmethod
+    def _sort_active(active):
+        """Put an active set back in start order, in place."""
+        effects = sorted(active.items(), key=itemgetter(1))
+        active.clear()
+        active.update(effects)
+
+    @staticmethod
+    def _low_priority(effect):
+        """True if the effect gives way first when frames are over budget."""
+        return effect.priority < 0 or (effect.cost_budget is not None
+                                       and effect.step_cost > effect.cost_budget)
+
+    def _check_budget(self, frame_time):
+        """Feed a frame's render and commit time to the budget and apply any change of level."""
+        budget = self.budget
+        previous = budget.update(frame_time)
+        if previous == budget.level:
+            return
+
+        if budget.level >= budget.DROP_LEVEL > previous:
+            self._drop_optional()
+        elif previous >= budget.DROP_LEVEL > budget.level:
+            self._restore_optional()
+
+        effects = [*self.background_effects, *self.foreground_effects, *self._parked]
+        budget.log(self.frame_count, previous, frame_time,
+                   effects=len(effects),
+                   low_priority=sum(1 for effect in effects if self._low_priority(effect)),
+                   dropped=len(self._dropped))
+
+    def _drop_optional(self):
+        """Take the optional foreground effects out of the active set, clearing their strips."""
+        for effect in [effect for effect in self.foreground_effects if effect.optional]:
+            self._dropped[effect] = self.foreground_effects.pop(effect)
+            self._cleared_strips[effect.strip] = self._cleared_strips.get(effect.strip, 0) + 1
+
+    def _restore_optional(self):
+        """Put the dropped optional foreground effects back in the active set."""
+        if not self._dropped:
+            return
+        for effect, order in self._dropped.items():
+            self._uncount(self._cleared_strips, effect.strip)
+            self.foreground_effects[effect] = order
+        self._dropped = {}
+        self._sort_active(self.foreground_effects)
+
+    def _resting(self, effects, strips_to_update, interval):
+        """
+        Return the low priority foreground effects that sit this frame
+        out.  That only works on strips nothing else redraws this frame,
+        since their pixels have to stay put until the next step.
+        """
+        active = self.foreground_effects
+        count = self._render_count
+        candidates = {effect for effect in effects
+                      if (count + active[effect]) % interval and self._low_priority(effect)}
+        if not candidates:
+            return ()
+        busy = set(strips_to_update)
+        busy.update(effect.strip for effect in effects if effect not in candidates)
+        return {effect for effect in candidates if effect.strip not in busy}
+
+    def _costed(self, step_effect):
+        """Wrap step_effect to keep step_cost up to date on effects with a cost_budget."""
+        smoothing = self.COST_SMOOTHING
+
+        def step(effect, elapsed_time):
+            if effect.cost_budget is None:
+                return step_effect(effect, elapsed_time)
+            t0 = time.perf_counter()
+            result = step_effect(effect, elapsed_time)
+            effect.step_cost += (time.perf_counter() - t0 - effect.step_cost) * smoothing
+            return result
+        return step
+
+    def _shared_strips(self, effects):
+        """Return the strips with more than one background effect, counting parked ones."""
+        shared = set(self._parked_strips)
+        seen = set()
+        for effect in effects:
+            if effect.strip in seen:
+                shared.add(effect.strip)
+            seen.add(effect.strip)
+        return shared
+
+    def stats(self):
+        """
+        Return the dispatcher's statistics as a dict: per-phase timing
+        histograms in milliseconds (when instrumented), commit counters,
+        how late scheduled actions ran in milliseconds, overall and by label,
+        pacing statistics (with deadline or adaptive pacing, the latter
+        including seconds spent at each frame rate) and pipeline depth,
+        underrun and latency statistics (when pipelined) and the frame
+        budget's level and log of degradation decisions (with a budget)
+        and garbage collections and per frame collection pauses in
+        milliseconds (once run with gc_slack) and what real-time mode
+        applied and fell back on, with wakeup latency (with realtime).
+        """
+        result = {
+            'frames': self.frame_count,
+            'culled_steps': self.culled_steps,
+            'throttled_steps': self.throttled_steps,
+            'hinted_sleeps': self.hinted_sleeps,
+            'sparse_restores': self.sparse_restores,
+            'commit': self.frame_commit.stats(),
+            'event_lateness': self.event_lateness.summary(scale=1000.0),
+            'action_lateness': {label: history.summary(scale=1000.0)
+                                for label, history in self.action_lateness.items()},
+        }
+        if self.frame_stats is not None:
+            result['timing'] = self.frame_stats.stats()
+        if self.pacer is not None:
+            result['pacing'] = self.pacer.stats()
+        if self.pipeline is not None:
+            result['pipeline'] = self.pipeline.stats()
+        if self.budget is not None:
+            result['budget'] = self.budget.stats()
+        if self.collector is not None:
+            result['gc'] = self.collector.stats()
+        if self.realtime is not None:
+            result['realtime'] = self.realtime.stats()
+        return result
+
+    def dump_stats(self, path):
+        """Write stats() to a file as JSON."""
+        with open(path, 'w') as f:
+            json.dump(self.stats(), f, indent=2)
 
     def run_frame(self):
         """Process one frame of animation."""
-        frame_start = time.time()
-        now = time.time()
+        if self.pipeline is not None:
+            self.run_pipelined_frame()
+            self.frame_count += 1
+            return
+
+        now = clock.now()
+
+        # The one instrumentation check for the frame
+        stats = self.frame_stats
+        if stats is not None or self.budget is not None:
+            t0 = time.perf_counter()
+
+        strips_to_update = self.render_frame(now, stats)
+
+        # Show the frame, each physical strip behind the updated strips goes
+        # out once even if several logical strips share it, and not at all
+        # if it hasn't changed
+        shows = self.frame_commit.shows
+        self.frame_commit.commit(strips_to_update, stats)
+
+        if stats is not None:
+            stats.record('frame', 'render+commit', time.perf_counter() - t0)
+        if self.budget is not None:
+            self._check_budget(time.perf_counter() - t0)
+
+        # Sleep to maintain frame rate, collecting garbage in the slack first
+        collector = self.collector
+        if isinstance(self.pacer, AdaptivePacer):
+            idle_until = self.idle_until()
+            if collector is not None:
+                wake = self.pacer.deadline() if idle_until is None else idle_until
+                collector.collect(wake - clock.now())
+            self.pacer.wait(self.frame_commit.shows != shows, idle_until)
+        elif self.pacer is not None:
+            if collector is not None:
+                collector.collect(self.pacer.deadline() - clock.now())
+            self.pacer.wait()
+        else:
+            if collector is not None:
+                collector.collect(now + self.frame_time - clock.now())
+            elapsed = clock.now() - now
+            sleep_time = self.frame_time - elapsed
+            if sleep_time > 0:
+                clock.sleep(sleep_time)
+
+        self.frame_count += 1
+
+    def idle_until(self):
+        """
+        If nothing is animating, only sleeping effects and scheduled
+        events are pending, return the clock time at which the
+        first of them is due, otherwise None.
+        """
+        if self.background_effects or self.foreground_effects or self._fills:
+            return None
+
+        wakeups = []
+        next_event = self.event_queue.next_time()
+        if next_event is not None and self.start_time is not None:
+            wakeups.append(self.start_time + next_event)
+        if self._sleepers:
+            wakeups.append(self._sleepers[0][0])
+        return min(wakeups) if wakeups else None
+
+    def run_pipelined_frame(self):
+        """
+        Render one frame as of the time it will be shown and queue it for
+        the pipeline's transmit thread.  Blocks while the pipeline is full,
+        which is what paces the renderer.
+        """
+        pipeline = self.pipeline
+        rendered_at = clock.now()
+        # Effects are rendered as of when the frame will be shown
+        now = pipeline.frame_target()
+
+        stats = self.frame_stats
+        if stats is not None or self.budget is not None:
+            t0 = time.perf_counter()
+
+        strips_to_update = self.render_frame(now, stats)
+
+        physical, requested = self.frame_commit.resolve(strips_to_update)
+        self.frame_commit.duplicate_shows_avoided += requested - len(physical)
+        physical = self.frame_commit.with_keepalives(physical)
+
+        if stats is not None:
+            stats.record('frame', 'render', time.perf_counter() - t0)
+        if self.budget is not None:
+            self._check_budget(time.perf_counter() - t0)
+
+        pipeline.submit(physical, rendered_at)
+
+        if self.collector is not None:
+            self.collector.collect(pipeline.slack())
+
+    def _repainted(self, strip, kind):
+        """Note that strip was just fully repainted, kind is 'background' or 'color'."""
+        for physical in physical_strips_of(strip):
+            previous = self._owners.get(physical)
+            if previous is not strip:
+                if previous is not None and hasattr(previous, 'untrack_touches'):
+                    # Its record of drawn pixels is no good any more
+                    previous.untrack_touches()
+                self._owners[physical] = strip
+        self._baselines[strip] = kind
+        if hasattr(strip, 'track_touches'):
+            strip.track_touches()
+
+    def _restore(self, strip, kind):
+        """
+        Repaint just the pixels drawn on strip since its last repaint, if
+        that gives the same frame as a full repaint with kind.  Returns
+        False if it has to be fully repainted.
+        """
+        if self._baselines.get(strip) != kind:
+            return False
+        for physical in physical_strips_of(strip):
+            if self._owners.get(physical) is not strip:
+                return False
+        if not strip.restore_touched(kind == 'background'):
+            return False
+        self.sparse_restores += 1
+        return True
 
-        # Group effects by strip for efficient processing
+    @staticmethod
+    def _occluded(effects, now):
+        """
+        Return the background effects that can't be seen this frame
+        because an opaque effect later in effects, which will be stepped
+        this frame, overwrites the same strip.
+        """
+        hidden = set()
+        covered = set()
+        for effect in reversed(effects):
+            if effect.strip in covered:
+                if hasattr(effect, 'skip'):
+                    hidden.add(effect)
+            elif getattr(effect, 'opaque', False) and now >= effect.pause_until:
+                covered.add(effect.strip)
+        return hidden
+
+    def render_frame(self, now, stats=None):
+        """
+        Step all the active effects for one frame and composite them onto
+        their strips, without showing anything.  If stats (a FrameStats) is
+        given, effect steps and strip copies are timed into it.
+        Returns the set of strips that were updated.
+        """
+        if stats is None:
+            step_effect = _step_effect
+            copy_background = _copy_background
+            copy_color = _copy_color
+        else:
+            step_effect = stats.timed_step
+            copy_background = lambda strip: stats.timed_call('copy', strip, strip.copy_background_to_strip)
+            copy_color = lambda strip: stats.timed_call('copy', strip, strip.copy_color_to_strip)
+
+        # Over budget, low priority effects are only stepped every interval frames
+        interval = 1
+        if self.budget is not None:
+            step_effect = self._costed(step_effect)
+            interval = self.budget.step_interval
+        self._render_count += 1
+
+        if self._sleepers and self._sleepers[0][0] <= now:
+            self._wake_effects(now)
+
+        # Group effects by strip for efficient processing.  Strips with
+        # sleeping or paused background effects keep showing their
+        # backgrounds, which haven't changed.
         strips_to_update = set()
+        held = set(self._parked_strips)
+
+        # Queued fills change the backgrounds, the copy below puts them
+        # into the frame
+        if self._fills:
+            fills, self._fills = self._fills, {}
+            for strip, color in fills.items():
+                if color is not None:
+                    strip.set_background(*color)
+                strips_to_update.add(strip)
 
         # Step all background effects and remove completed ones
+        # Iterate over a copy, effects and scheduled actions can start and
+        # stop effects while we go
+        background_effects = list(self.background_effects)
+        hidden = self._occluded(background_effects, now) if len(background_effects) > 1 else ()
+        shared = None
         completed = []
-        for effect in self.background_effects:
+        for effect in background_effects:
+            if effect not in self.background_effects:
+                continue
             if effect.pause_started_at > 0 and now >= effect.pause_until:
                 # Pause is over, correct the start time
                 actual_pause_duration = now - effect.pause_started_at
@@ -259,29 +1149,90 @@ class Dispatcher:
                 effect.pause_started_at = 0
 
             if now < effect.pause_until:
-                strips_to_update.add(effect.strip)
+                # Wait the pause out in the wake heap, the start time gets
+                # corrected when it wakes
+                self._park(effect, self.background_effects, effect.pause_until)
+                held.add(effect.strip)
+                continue
+
+            if (interval > 1 and (self._render_count + self.background_effects[effect]) % interval
+                    and self._low_priority(effect)):
+                # Sitting this frame out, its background stays as it was
+                self.throttled_steps += 1
+                held.add(effect.strip)
                 continue
 
             elapsed = now - effect.start_time
-            if not effect.step(elapsed):
+            result = None
+            stepped = False
+            if effect in hidden:
+                # Covered by a later opaque effect, just advance its time
+                result = effect.skip(elapsed)
+                if result is not None:
+                    self.culled_steps += 1
+            if result is None:
+                result = step_effect(effect, elapsed)
+                stepped = True
+            if not result:
                 completed.append(effect)
-            else:
-                strips_to_update.add(effect.strip)
+            elif result is not True and isinstance(result, Sleep) and result.seconds > 0:
+                self._park(effect, self.background_effects, now + result.seconds)
+            elif stepped:
+                change = effect.next_change(elapsed)
+                if change is not None and change > elapsed:
+                    # Nothing to do until then, unless another effect on
+                    # the strip could draw over it meanwhile
+                    if shared is None:
+                        shared = self._shared_strips(background_effects)
+                    if effect.strip not in shared:
+                        self._park(effect, self.background_effects,
+                                   effect.start_time + change - self.HINT_SLACK)
+                        self.hinted_sleeps += 1
+            # The final step still drew, so the strip gets updated either way
+            strips_to_update.add(effect.strip)
         for effect in completed:
-            self.background_effects.remove(effect)
+            self.background_effects.pop(effect, None)
+            self._finish(effect, now)
 
-        # Copy background to strip for each affected strip
+        # Copy background to strip for each affected strip.  Where the
+        # background didn't change only the pixels foreground effects drew
+        # over last frame need putting back.
         for strip in strips_to_update:
-            strip.copy_background_to_strip()
+            copy_background(strip)
+            self._repainted(strip, 'background')
+        for strip in held:
+            if strip not in strips_to_update and not self._restore(strip, 'background'):
+                copy_background(strip)
+                self._repainted(strip, 'background')
+        strips_to_update |= held
+
+        # Strips with paused foreground effects get cleared as if the
+        # effects were still there
+        for strip in self._cleared_strips:
+            if strip not in strips_to_update:
+                if not self._restore(strip, 'color'):
+                    copy_color(strip)
+                    self._repainted(strip, 'color')
+                strips_to_update.add(strip)
 
         # Step all foreground effects and remove completed ones
+        foreground_effects = list(self.foreground_effects)
+        resting = self._resting(foreground_effects, strips_to_update, interval) if interval > 1 else ()
         completed = []
-        for effect in self.foreground_effects:
+        for effect in foreground_effects:
+            if effect not in self.foreground_effects:
+                continue
+            if effect in resting:
+                self.throttled_steps += 1
+                continue
             if effect.strip not in strips_to_update:
                 # no background effect got copied to the strip,
                 # so clear the strip to remove residual pixels
-                # from prior foreground effects
-                effect.strip.copy_color_to_strip()
+                # from prior foreground effects, just the ones they
+                # drew if we can
+                if not self._restore(effect.strip, 'color'):
+                    copy_color(effect.strip)
+                    self._repainted(effect.strip, 'color')
                 strips_to_update.add(effect.strip)
 
             if effect.pause_started_at > 0 and now >= effect.pause_until:
@@ -291,55 +1242,176 @@ class Dispatcher:
                 effect.pause_started_at = 0
 
             if now < effect.pause_until:
+                self._park(effect, self.foreground_effects, effect.pause_until, cleared=True)
                 continue
 
             elapsed = now - effect.start_time
-            if not effect.step(elapsed):
+            result = step_effect(effect, elapsed)
+            if not result:
                 completed.append(effect)
+            elif result is not True and isinstance(result, Sleep) and result.seconds > 0:
+                self._park(effect, self.foreground_effects, now + result.seconds)
 
         for effect in completed:
-            self.foreground_effects.remove(effect)
+            self.foreground_effects.pop(effect, None)
+            self._finish(effect, now)
 
-        # Show the frame for all updated strips
-        for strip in strips_to_update:
-            strip.show()
+        return strips_to_update
 
-        # Sleep to maintain frame rate
-        elapsed = time.time() - frame_start
-        sleep_time = self.frame_time - elapsed
-        if sleep_time > 0:
-            time.sleep(sleep_time)
+    def seek(self, virtual_time):
+        """
+        Jump the show forward to virtual_time without rendering the frames
+        in between, to rejoin a running show after a restart say.
+
+        The scheduled actions due by then and the ends of the effects they
+        start are swept through in time order, using an index of effect
+        end times.  Effects that would have finished are stepped once at
+        their end, so backgrounds are left as they would have been, and
+        completed, so chains move on to their next link as of when it was
+        due.  The effects still running at virtual_time carry on with the
+        right elapsed time, after their seek() sets up any state built up
+        along the way.  Only forward jumps are possible.
+        """
+        now = clock.now()
+        if self.start_time is not None and virtual_time < now - self.start_time:
+            raise ValueError(f"Can't seek back to {virtual_time}, the show is at {now - self.start_time}")
+        self.start_time = now - virtual_time
+
+        # Heap of (end time, sequence, effect) for the effects with durations
+        ends = []
+        indexed = set()
+
+        def index_new_effects():
+            for active in (self.background_effects, self.foreground_effects):
+                for effect in active:
+                    if effect in indexed:
+                        continue
+                    indexed.add(effect)
+                    duration = getattr(effect, 'duration', None)
+                    if isinstance(duration, (int, float)) and duration >= 0:
+                        heapq.heappush(ends, (effect.start_time + duration, len(indexed), effect))
+
+        def flush_fills():
+            # Fills have to land in order with the final steps
+            for strip, color in self._fills.items():
+                if color is not None:
+                    strip.set_background(*color)
+                    self._fills[strip] = None
+
+        index_new_effects()
+        while True:
+            next_event = self.event_queue.next_time()
+            if next_event is not None and next_event > virtual_time:
+                next_event = None
+            if ends and ends[0][0] <= now and (next_event is None
+                                               or ends[0][0] <= self.start_time + next_event):
+                end, _, effect = heapq.heappop(ends)
+                if effect in self.background_effects:
+                    flush_fills()
+                    effect.step(end - effect.start_time)
+                    del self.background_effects[effect]
+                    self._fills[effect.strip] = None
+                elif effect in self.foreground_effects:
+                    del self.foreground_effects[effect]
+                else:
+                    # Stopped by something along the way
+                    continue
+                _call_at(end, effect.complete)
+            elif next_event is not None:
+                for fire_time, event in self.event_queue.pop_due(next_event):
+                    try:
+                        _call_at(self.start_time + fire_time, event.action)
+                    except Exception as e:
+                        print(f"Error executing scheduled action: {event.action}\n{e}")
+            else:
+                break
+            index_new_effects()
+        flush_fills()
 
-        self.frame_count += 1
+        for effect in [*self.background_effects, *self.foreground_effects]:
+            effect.seek(now - effect.start_time)
 
-    def run(self, duration=None):
+    def run(self, duration=None, start_at=None, gc_slack=False):
         """
         Run the animation loop.
         duration: Run for this many seconds, or forever if None
+        start_at: Virtual time to start the show at, see seek().  A
+            restarted controller can rejoin a show in its first frame.
+        gc_slack: Turn off automatic garbage collection while the show
+            runs and collect only in the slack after each frame goes out,
+            so the collector can't stall a frame.  See SlackCollector,
+            pause times are in stats()['gc'].
         """
-        self.start_time = time.time()
+        # Whatever setup gets done before one step raises is undone by the finally
+        try:
+            if self.realtime is not None:
+                # The thread that runs the show is the frame thread
+                self.realtime.start()
+            if self.time_source is not None:
+                # Another Dispatcher may have installed its own since
+                set_clock(self.time_source)
+            run_started = clock.now()
+            if start_at:
+                self.start_time = None
+                self.seek(start_at)
+            else:
+                # Virtual time runs on the show clock, monotonic by default so
+                # wall clock steps don't move scheduled events
+                self.start_time = run_started
+            if self.pacer is not None:
+                self.pacer.start()
+            if self.pipeline is not None:
+                self.pipeline.start()
+            if gc_slack:
+                if self.collector is None:
+                    self.collector = SlackCollector()
+                self.collector.start()
+
+            while True:
+                # Process event queue, when pipelined as of the time the
+                # frame about to be rendered will be shown
+                if self.pipeline is not None:
+                    virtual_now = self.pipeline.frame_target() - self.start_time
+                else:
+                    virtual_now = clock.now() - self.start_time
+                self.run_events(virtual_now)
+
+                self.run_frame()
+
+                if duration and (clock.now() - run_started) >= duration:
+                    break
+
+                # Break if no active effects and no pending events
+                if not self.is_active():
+                    break
+        finally:
+            try:
+                # Send whatever is still in the pipeline, raising any error
+                # sending the last frames
+                if self.pipeline is not None:
+                    self.pipeline.close()
+            finally:
+                # Lane threads, if any, are restarted by the next frame
+                self.frame_commit.close()
+                if gc_slack and self.collector is not None:
+                    self.collector.stop()
+                if self.realtime is not None:
+                    # Lanes and pipeline thread are gone, only this thread to undo
+                    self.realtime.stop()
 
-        while True:
-            # Process event queue
-            virtual_now = time.time() - self.start_time
-            while self.event_queue and self.event_queue[0][0] <= virtual_now:
-                _, _, action = heapq.heappop(self.event_queue)
-                try:
-                    action()
-                except Exception as e:
-                    print(f"Error executing scheduled action: {action}\n{e}")
-
-            self.run_frame()
-
-            if duration and (time.time() - self.start_time) >= duration:
-                break
 
-            # Break if no active effects and no pending events
-            if not self.background_effects and not self.foreground_effects and not self.event_queue:
-                break
+# Background Effects (Wipes)
 
+def _next_count_time(elapsed_time, duration, steps):
+    """
+    Return when int(steps * progress) next goes up for an effect that
+    reaches steps at duration, or duration if it doesn't before then.
+    """
+    if steps <= 0 or elapsed_time >= duration:
+        return duration
+    count = int(steps * (elapsed_time / duration))
+    return min((count + 1) * duration / steps, duration)
 
-# Background Effects (Wipes)
 
 class WipeLowHigh(BackgroundEffect):
     """Fills the background from first pixel to last."""
@@ -360,6 +1432,9 @@ class WipeLowHigh(BackgroundEffect):
         # Return True if still running, False if complete
         return elapsed_time < self.duration
 
+    def next_change(self, elapsed_time):
+        return _next_count_time(elapsed_time, self.duration, self.width)
+
 
 class WipeHighLow(BackgroundEffect):
     """Fills the background from last pixel to first."""
@@ -380,6 +1455,9 @@ class WipeHighLow(BackgroundEffect):
         # Return True if still running, False if complete
         return elapsed_time < self.duration
 
+    def next_change(self, elapsed_time):
+        return _next_count_time(elapsed_time, self.duration, self.width)
+
 
 class WipeOutsideIn(BackgroundEffect):
     """Fills the background from both ends towards center."""
@@ -406,6 +1484,9 @@ class WipeOutsideIn(BackgroundEffect):
         # Return True if still running, False if complete
         return elapsed_time < self.duration
 
+    def next_change(self, elapsed_time):
+        return _next_count_time(elapsed_time, self.duration, self.max_offset)
+
 
 class WipeInsideOut(BackgroundEffect):
     """Fills the background from center towards both ends."""
@@ -435,10 +1516,15 @@ class WipeInsideOut(BackgroundEffect):
         # Return True if still running, False if complete
         return elapsed_time < self.duration
 
+    def next_change(self, elapsed_time):
+        return _next_count_time(elapsed_time, self.duration, self.max_offset)
+
 
 class FadeBackground(BackgroundEffect):
     """Fade the entire background to a target color over time."""
 
+    opaque = True
+
     def init(self, r=255, g=255, b=255, duration=1.0):
         self.target_color = Color(r, g, b)
         self.duration = duration
@@ -523,6 +1609,8 @@ class Pulsator(BackgroundEffect):
         because if the result is < 0 it is clamed to 0.
     """
 
+    opaque = True
+
     def init(self, h=0.5, s=1.0, max_v=0.5, pulses=5, pulse_nodes=3, offset=0.2, threshold=0.2, duration=10.0):
         self.duration = duration
         self.max_v = max_v
@@ -555,6 +1643,8 @@ class Pulsator(BackgroundEffect):
         return elapsed_time < self.duration
 
 class SimplePulsator(BackgroundEffect):
+    opaque = True
+
     def init(self, min_node_width_pct=5, max_node_width_pct=10, n_nodes=3, node_pulses=5, low_h=0.7, high_h=0.7, s=1.0, min_v=0.1, max_v=1.0, duration=10, speed=0):
         self.duration = duration
         self.min_node_width_pct = min_node_width_pct / 100.0  # Convert to fractional percentage
@@ -618,6 +1708,9 @@ class SimplePulsator(BackgroundEffect):
 class ImageBackground(BackgroundEffect):
     """Play an image row by row into the background array."""
 
+    # Not opaque, it only writes the background when the row changes, so
+    # on other frames an effect underneath would show through
+
     def __init__(self, strip, image_path):
         """
         Initialize the ImageBackground effect and load the image.
@@ -687,6 +1780,22 @@ class ImageBackground(BackgroundEffect):
         else:
             return elapsed_time < self.duration
 
+    def next_change(self, elapsed_time):
+        # The row only changes every time_per_row
+        if self.time_per_row <= 0:
+            return None
+        next_row = (int(elapsed_time / self.time_per_row) + 1) * self.time_per_row
+        if self.loop:
+            return next_row
+        return min(next_row, self.duration)
+
+    def skip(self, elapsed_time):
+        # Redraw the row whenever the effect is next visible
+        self.last_row = -1
+        if self.image_height == 0:
+            return False
+        return self.loop or elapsed_time < self.duration
+
 
 # Foreground Effects
 
@@ -798,11 +1907,10 @@ class Sparkle(ForegroundEffect):
         num_new_sparkles_float = self.width * self.density * self.frame_time
         num_new_sparkles = int(num_new_sparkles_float)
         # Add a fractional sparkle based on probability
-        if random.random() < num_new_sparkles_float - num_new_sparkles:
+        if self.rng.random() < num_new_sparkles_float - num_new_sparkles:
             num_new_sparkles += 1
 
-        for _ in range(num_new_sparkles):
-            pos = random.randint(0, self.width - 1)
+        for pos in self.rng.integers(0, self.width, size=num_new_sparkles).tolist():
             # A new sparkle will reset the fade-in of an existing one at the same position
             self.sparkles[pos] = (elapsed_time, True)
 
@@ -844,6 +1952,21 @@ class Sparkle(ForegroundEffect):
         # Run forever if no duration
         return True
 
+    def seek(self, elapsed_time):
+        # A sparkle lives 2 * fade_time, so only the ones born in that
+        # window before elapsed_time can still be showing.  Make them up.
+        self.last_time = elapsed_time
+        self.sparkles = {}
+        window = min(elapsed_time, 2 * self.fade_time)
+        count = int(self.width * self.density * window + self.rng.random())
+        born_times = sorted((elapsed_time - self.rng.random(count) * window).tolist())
+        positions = self.rng.integers(0, self.width, size=count).tolist()
+        for born, pos in zip(born_times, positions):
+            if elapsed_time - born < self.fade_time:
+                self.sparkles[pos] = (born, True)
+            else:
+                self.sparkles[pos] = (born + self.fade_time, False)
+
 class Chase(ForegroundEffect):
     """A dot or group of dots that chase around the strip."""
 
@@ -877,9 +2000,13 @@ class Chase(ForegroundEffect):
 class BlockFill(BackgroundEffect):
     """
     Fills the strip by animating blocks into place one by one from right to left.
-    Includes a pause before each block animation.
+    Includes a pause before each block animation, which the effect sleeps
+    through rather than being stepped.
     """
 
+    # Not opaque, the first pause sleeps without drawing anything, so an
+    # effect underneath would show through
+
     def init(self, r=0, g=0, b=255, block_width_pct=5.0, outline_pct=1.0, speed_pct_per_sec=100.0, pause=0.2):
         self.color = Color(r, g, b)
         self.block_width_pct = block_width_pct / 100.0
@@ -899,14 +2026,11 @@ class BlockFill(BackgroundEffect):
         else:
             self.num_blocks = math.ceil(self.width / self.total_block_width)
 
-        # Animation state
+        # Animation state, starting with a pause
         self.current_block_index = 0
-        self.block_animation_start_time = 0
+        self.block_animation_start_time = self.pause_duration
         self._calculate_current_block_duration()
 
-        # Start with a pause
-        self.request_pause(self.pause_duration)
-
 
     def _calculate_current_block_duration(self):
         """Calculates the animation duration for the current block based on speed."""
@@ -924,12 +2048,12 @@ class BlockFill(BackgroundEffect):
         else:
             self.current_block_duration = 0  # Appears instantly if no speed
 
-        # This marks the beginning of the animation for the current block,
-        # relative to the effect's total elapsed time.
-        self.block_animation_start_time = time.time() - self.start_time
-
 
     def step(self, elapsed_time):
+        if elapsed_time < self.block_animation_start_time:
+            # Pausing before the next block, the background is already drawn
+            return Sleep(self.block_animation_start_time - elapsed_time)
+
         if self.current_block_index >= self.num_blocks:
             return False  # Effect is complete
 
@@ -938,17 +2062,7 @@ class BlockFill(BackgroundEffect):
         progress = min(elapsed_for_block / self.current_block_duration, 1.0) if self.current_block_duration > 0 else 1.0
 
         # --- Drawing ---
-        # Clear the entire background for this frame
-        for i in range(self.width):
-            self.background[i] = Color(0, 0, 0)
-
-        # Redraw all settled blocks at their final positions (from the right)
-        for i in range(self.current_block_index):
-            start_pos = self.width - (i + 1) * self.total_block_width
-            for p_offset in range(self.block_width_pixels):
-                p = start_pos + p_offset
-                if 0 <= p < self.width:
-                    self.background[p] = self.color
+        self._draw_settled()
 
         # Draw the currently animating block
         target_start_pos = self.width - (self.current_block_index + 1) * self.total_block_width
@@ -963,20 +2077,47 @@ class BlockFill(BackgroundEffect):
             # The block is now settled. Increment index for the next block.
             self.current_block_index += 1
 
-            # Request a pause before the next block (or before finishing)
-            self.request_pause(self.pause_duration)
+            # Pause before the next block (or before finishing).  This marks
+            # the beginning of the animation for the next block, relative
+            # to the effect's total elapsed time.
+            self.block_animation_start_time = elapsed_time + self.pause_duration
 
             # If there are more blocks, calculate the next duration
             if self.current_block_index < self.num_blocks:
                 self._calculate_current_block_duration()
 
+            return Sleep(self.pause_duration)
+
         return True
 
+    def _draw_settled(self):
+        """Clear the background and draw the settled blocks at their final positions (from the right)."""
+        for i in range(self.width):
+            self.background[i] = Color(0, 0, 0)
+
+        for i in range(self.current_block_index):
+            start_pos = self.width - (i + 1) * self.total_block_width
+            for p_offset in range(self.block_width_pixels):
+                p = start_pos + p_offset
+                if 0 <= p < self.width:
+                    self.background[p] = self.color
+
+    def seek(self, elapsed_time):
+        # Settle every block whose animation ended by elapsed_time, each
+        # followed by its pause, then draw them, since a step landing in
+        # a pause draws nothing
+        while (self.current_block_index < self.num_blocks and elapsed_time >=
+               self.block_animation_start_time + self.current_block_duration):
+            self.block_animation_start_time += self.current_block_duration + self.pause_duration
+            self.current_block_index += 1
+            self._calculate_current_block_duration()
+        self._draw_settled()
+
 
 # Helper class for the GravityFill effect
 class _Raindrop:
-    def __init__(self, initial_velocity, target_y):
-        self.start_time = time.time()
+    def __init__(self, initial_velocity, target_y, start_time):
+        self.start_time = start_time
         self.initial_velocity = initial_velocity
         self.target_y = target_y
 
@@ -986,6 +2127,8 @@ class RaindropFill(BackgroundEffect):
     Fills the strip with pixels that fall from the top with simulated gravity.
     """
 
+    opaque = True
+
     def init(self, color=Color(0, 0, 64), min_launch_rate=5.0, max_launch_rate=15.0,
              min_initial_velocity=10.0, max_initial_velocity=30.0, acceleration=50.0):
         self.color = color
@@ -1008,17 +2151,18 @@ class RaindropFill(BackgroundEffect):
         if self.pixels_filled >= self.width and not self.active_raindrops:
             return False  # Effect is complete
 
-        now = time.time()
+        # The frame's time on the show clock
+        now = self.start_time + elapsed_time
 
         # 1. Launch new raindrops if it's time
         if now >= self.next_launch_time and self.pixels_filled < self.width:
             target_y = self.width - self.pixels_filled - 1
-            initial_velocity = random.uniform(self.min_initial_velocity, self.max_initial_velocity)
-            drop = _Raindrop(initial_velocity, target_y)
+            initial_velocity = self.rng.uniform(self.min_initial_velocity, self.max_initial_velocity)
+            drop = _Raindrop(initial_velocity, target_y, now)
             self.active_raindrops.append(drop)
 
             # Schedule the next launch
-            launch_rate = random.uniform(self.min_launch_rate, self.max_launch_rate)
+            launch_rate = self.rng.uniform(self.min_launch_rate, self.max_launch_rate)
             if launch_rate > 0:
                 self.next_launch_time = now + (1.0 / launch_rate)
             else:
@@ -1055,6 +2199,38 @@ class RaindropFill(BackgroundEffect):
 
         return True
 
+    def _landing_time(self, drop):
+        """Clock time a drop reaches its target, solving v * t + a * t^2 / 2 = target."""
+        v, a, y = drop.initial_velocity, self.acceleration, drop.target_y
+        if y <= 0:
+            return drop.start_time
+        if a > 0:
+            return drop.start_time + (math.sqrt(v * v + 2 * a * y) - v) / a
+        return drop.start_time + (y / v if v > 0 else math.inf)
+
+    def seek(self, elapsed_time):
+        # Play the launches and landings through to elapsed_time in order,
+        # without drawing
+        now = self.start_time + elapsed_time
+        self.active_raindrops = []
+        self.pixels_filled = 0
+        launch_time = self.start_time
+        while True:
+            landing, drop = min(((self._landing_time(drop), drop) for drop in self.active_raindrops),
+                                key=lambda entry: entry[0], default=(math.inf, None))
+            if launch_time <= min(now, landing) and self.pixels_filled < self.width:
+                target_y = self.width - self.pixels_filled - 1
+                initial_velocity = self.rng.uniform(self.min_initial_velocity, self.max_initial_velocity)
+                self.active_raindrops.append(_Raindrop(initial_velocity, target_y, launch_time))
+                launch_rate = self.rng.uniform(self.min_launch_rate, self.max_launch_rate)
+                launch_time += 1.0 / launch_rate if launch_rate > 0 else 0.1
+            elif landing <= now:
+                self.active_raindrops.remove(drop)
+                self.pixels_filled += 1
+            else:
+                break
+        self.next_launch_time = launch_time
+
 
 class HighStriker(ForegroundEffect):
     """
@@ -1295,6 +2471,10 @@ class LighthouseSweep(ForegroundEffect):
         rotation_fraction = (elapsed_time * self.rotation_speed) % 1.0
         beam_center = int(rotation_fraction * self.width)
 
+        # The frame's flicker chances and strengths, drawn all at once
+        flicker_chance = self.rng.random(self.width).tolist()
+        flicker_amount = self.rng.random(self.width).tolist()
+
         # Draw the lighthouse beam
         for i in range(self.width):
             # Calculate distance from beam center (handling wrap-around)
@@ -1345,9 +2525,9 @@ class LighthouseSweep(ForegroundEffect):
                 r, g, b = self.hsv_to_rgb(h, s, v)
 
             # Add occasional flicker for realism
-            if distance <= self.core_width and random.random() < 0.02:
+            if distance <= self.core_width and flicker_chance[i] < 0.02:
                 # Slight intensity variation in core
-                flicker = 0.9 + random.random() * 0.1
+                flicker = 0.9 + flicker_amount[i] * 0.1
                 r = int(r * flicker)
                 g = int(g * flicker)
                 b = int(b * flicker)
@@ -1370,6 +2550,8 @@ class BowWave(BackgroundEffect):
     that travels from bow to stern with foam and turbulence.
     """
 
+    opaque = True
+
     def init(self, max_speed_knots=18.0, bow_position=0.15, duration=None):
         """
         Initialize the bow wave effect.
@@ -1411,7 +2593,7 @@ class BowWave(BackgroundEffect):
         """Get current speed in knots from GPS, or 0 if unavailable."""
         if not self.gps_available:
             # Demo mode: simulate varying speed
-            demo_speed = 5 + 5 * math.sin(time.time() * 0.2)
+            demo_speed = 5 + 5 * math.sin(clock.now() * 0.2)
             return max(0, demo_speed)
 
         try:
@@ -1513,14 +2695,16 @@ class BowWave(BackgroundEffect):
             # Add continuous turbulence at bow when at high speed
             if speed_ratio > 0.3:
                 turb_width = int(5 + speed_ratio * 10)
-                for i in range(max(0, self.bow_pixel - turb_width),
-                             min(self.width, self.bow_pixel + turb_width)):
+                turb_start = max(0, self.bow_pixel - turb_width)
+                turb_end = min(self.width, self.bow_pixel + turb_width)
+                foam_chance = self.rng.random(max(0, turb_end - turb_start)).tolist()
+                for i in range(turb_start, turb_end):
                     distance = abs(i - self.bow_pixel)
                     turb_intensity = max(0, 1 - distance / turb_width)
                     turb_intensity *= speed_ratio
 
                     # Add random sparkle for foam
-                    if random.random() < turb_intensity * 0.3:
+                    if foam_chance[i - turb_start] < turb_intensity * 0.3:
                         self.background[i] = self.foam_color
                     else:
                         self.background[i] = Effect.interpolate_color(
@@ -1536,6 +2720,10 @@ class BowWave(BackgroundEffect):
         # Run forever if no duration
         return True
 
+    def skip(self, elapsed_time):
+        # Wave particles age out by elapsed time, nothing to catch up on
+        return self.duration is None or elapsed_time < self.duration
+
 
 # Example usage
 """
@@ -0,0 +1,136 @@
+"""
+The Dispatcher's queue of scheduled actions.
+
+A heap of (fire_time, sequence, ScheduledEvent).  Every scheduled action
+gets a ScheduledEvent handle back that can cancel it.  Cancelling just
+marks the event, it is thrown away when it reaches the top of the heap,
+and the heap is rebuilt without the dead entries if they ever make up
+most of it, so pushes, pops and cancels all stay cheap with tens of
+thousands of actions pending.  Recurring events put themselves back on
+the heap after each run.
+"""
+
+import heapq
+
+
+class ScheduledEvent:
+    """Handle for a scheduled action, returned by Dispatcher.schedule() and every()."""
+
+    __slots__ = ('fire_time', 'action', 'interval', 'remaining', 'cancelled', 'label',
+                 'lateness', '_queue')
+
+    def __init__(self, queue, fire_time, action, interval=None, count=None, label=None):
+        self._queue = queue
+        self.fire_time = fire_time
+        self.action = action
+        # Name for lateness statistics
+        self.label = label or getattr(action, '__qualname__', None) or repr(action)
+        # Seconds after its fire time the action last ran, None until it has
+        self.lateness = None
+        # Seconds between runs for a recurring event, None to run once
+        self.interval = interval
+        # Runs left for a recurring event, None for no limit
+        self.remaining = count
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop the action from running (again).  Returns False if it was already cancelled or done."""
+        if self._queue is None:
+            return False
+        return self._queue.cancel(self)
+
+    @property
+    def pending(self):
+        """True if the action is still due to run."""
+        return not self.cancelled and self._queue is not None
+
+
+class EventQueue:
+    """Heap of scheduled actions with lazy cancellation."""
+
+    # Rebuild the heap once cancelled entries are more than this fraction of it
+    COMPACT_FRACTION = 0.5
+    # ...and there are at least this many of them
+    COMPACT_MINIMUM = 64
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = 0
+        self._cancelled = 0
+
+    def __len__(self):
+        """Number of actions still pending, not counting cancelled ones."""
+        return len(self._heap) - self._cancelled
+
+    def push(self, fire_time, action, interval=None, count=None, label=None):
+        """Schedule action at fire_time and return its ScheduledEvent."""
+        event = ScheduledEvent(self, fire_time, action, interval, count, label)
+        self._push(event)
+        return event
+
+    def _push(self, event):
+        heapq.heappush(self._heap, (event.fire_time, self._sequence, event))
+        self._sequence += 1
+
+    def cancel(self, event):
+        """Cancel a pending event, returns False if it wasn't pending."""
+        if not event.pending:
+            return False
+        event.cancelled = True
+        self._cancelled += 1
+        if (self._cancelled >= self.COMPACT_MINIMUM
+                and self._cancelled > len(self._heap) * self.COMPACT_FRACTION):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """
+        Rebuild the heap without the cancelled entries, in place, since
+        pop_due() and next_time() may be partway through it.
+        """
+        for _, _, event in self._heap:
+            if event.cancelled:
+                event._queue = None
+        self._heap[:] = [entry for entry in self._heap if not entry[2].cancelled]
+        heapq.heapify(self._heap)
+        self._cancelled = 0
+
+    def next_time(self):
+        """Return the fire time of the next pending action, or None if there are none."""
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            self._drop_top()
+        return heap[0][0] if heap else None
+
+    def _drop_top(self):
+        _, _, event = heapq.heappop(self._heap)
+        event._queue = None
+        self._cancelled -= 1
+
+    def pop_due(self, now):
+        """
+        Yield (fire time, event) for the actions due at or before now, in
+        fire time order.  Recurring events are rescheduled for their next
+        run after now as they are yielded, skipping any runs that were
+        missed, so the fire time yielded is the one for this run.
+        """
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            fire_time, _, event = heapq.heappop(heap)
+            if event.cancelled:
+                event._queue = None
+                self._cancelled -= 1
+                continue
+
+            if event.remaining is not None:
+                event.remaining -= 1
+            if event.interval is not None and event.remaining != 0:
+                next_time = fire_time + event.interval
+                if next_time <= now:
+                    next_time += (int((now - next_time) / event.interval) + 1) * event.interval
+                event.fire_time = next_time
+                self._push(event)
+            else:
+                event._queue = None
+
+            yield fire_time, event
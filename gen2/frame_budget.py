@@ -0,0 +1,101 @@
+"""
+Frame budget for the Dispatcher, degrading gracefully under load.
+
+When rendering a frame takes longer than the budget, rather than the
+whole show slowing down together, the Dispatcher gives up detail in
+steps: first low priority effects are stepped every other frame, then
+every fourth, then optional foreground effects are dropped altogether.
+Once frames come in comfortably under budget again it undoes the steps
+one at a time.  Every change is logged with the frame time and effect
+counts that caused it, which is what you want when sizing hardware.
+"""
+
+from collections import deque
+
+
+class FrameBudget:
+    """Decides the degradation level from measured frame times and logs the decisions."""
+
+    # What each level does, in the order they are applied
+    LEVELS = ('normal', 'low priority at 1/2 rate', 'low priority at 1/4 rate',
+              'optional effects dropped')
+    # How often low priority effects are stepped at each level
+    STEP_INTERVALS = (1, 2, 4, 4)
+    # The level at which optional foreground effects are dropped
+    DROP_LEVEL = 3
+
+    def __init__(self, budget, patience=5, recovery=60, headroom=0.7, log_size=1000):
+        """
+        Args:
+            budget: Seconds a frame's render and commit may take
+            patience: Frames in a row over budget before degrading a level
+            recovery: Frames in a row under headroom * budget before
+                restoring a level
+            headroom: Fraction of the budget frames have to come in under
+                to count towards recovery
+            log_size: How many decisions to keep
+        """
+        self.budget = budget
+        self.patience = patience
+        self.recovery = recovery
+        self.headroom = headroom
+
+        self.level = 0
+        self.over = 0
+        self.under = 0
+        self.decisions = deque(maxlen=log_size)
+        self.frames_at_level = [0] * len(self.LEVELS)
+
+    @property
+    def step_interval(self):
+        """How often low priority effects are stepped at the current level."""
+        return self.STEP_INTERVALS[self.level]
+
+    def update(self, frame_time):
+        """
+        Account for a frame that took frame_time seconds, moving to the
+        next level up or down if it calls for that, and return the level
+        it was at before.
+        """
+        previous = self.level
+        self.frames_at_level[previous] += 1
+
+        if frame_time > self.budget:
+            self.over += 1
+            self.under = 0
+            if self.over >= self.patience and self.level < len(self.LEVELS) - 1:
+                self.over = 0
+                self.level += 1
+        elif frame_time < self.budget * self.headroom:
+            self.under += 1
+            self.over = 0
+            if self.under >= self.recovery and self.level > 0:
+                self.under = 0
+                self.level -= 1
+        else:
+            self.over = 0
+            self.under = 0
+        return previous
+
+    def log(self, frame, previous, frame_time, **detail):
+        """
+        Record the change from level previous to the current one, made at
+        frame because of a frame_time second frame.
+        """
+        self.decisions.append({
+            'frame': frame,
+            'from': self.LEVELS[previous],
+            'to': self.LEVELS[self.level],
+            'frame_ms': frame_time * 1000.0,
+            'budget_ms': self.budget * 1000.0,
+            **detail,
+        })
+
+    def stats(self):
+        """Return the current level, frames spent at each level and the decision log."""
+        return {
+            'level': self.LEVELS[self.level],
+            'budget_ms': self.budget * 1000.0,
+            'frames_at_level': dict(zip(self.LEVELS, self.frames_at_level)),
+            'decisions': list(self.decisions),
+        }
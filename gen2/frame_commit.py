@@ -0,0 +1,178 @@
+"""
+Commit stage for the Dispatcher's frame loop.
+
+Effects run against whatever strip they were given, physical or
+logical, and several logical strips can cover the same physical strip.
+At the end of a frame the commit stage resolves all the strips that were
+touched down to their physical strips and sends each one to the wire
+exactly once, or not at all if its pixels haven't changed since the last
+time it was sent.
+"""
+
+import time
+
+from frame_stats import StripLabels
+from transmit_lanes import TransmitLanes
+
+
+def physical_strips_of(strip):
+    """Return the physical strips behind a strip, or the strip itself if it is physical."""
+    resolve = getattr(strip, 'physical_strips', None)
+    if resolve is None:
+        return (strip,)
+    return resolve()
+
+
+class FrameCommit:
+    """Sends each physical strip touched during a frame to the wire once."""
+
+    def __init__(self, skip_unchanged=True, keepalive=None, parallel=False, on_thread_start=None):
+        """
+        Args:
+            skip_unchanged: Don't retransmit a physical strip whose frame is
+                identical to the last one it sent
+            keepalive: With skip_unchanged, resend an unchanged strip anyway
+                after this many seconds (None to never resend)
+            parallel: Send the physical strips at the same time, each on
+                its own thread, see TransmitLanes
+            on_thread_start: With parallel, run first thing in each lane
+                thread
+        """
+        self.skip_unchanged = skip_unchanged
+        self.keepalive = keepalive
+        self.lanes = TransmitLanes(self.send, on_thread_start) if parallel else None
+
+        self.frames = 0
+
+        # Physical strip transmits actually done, and ones skipped because
+        # the strip's pixels were unchanged
+        self.shows = 0
+        self.skipped_shows = 0
+
+        # Transmits that calling show() on every touched strip would have
+        # done on top of those, because strips share physical strips
+        self.duplicate_shows_avoided = 0
+
+        # Every physical strip committed so far, in order first seen, and
+        # the names they are reported under
+        self._strips = []
+        self.labels = StripLabels()
+
+    @staticmethod
+    def resolve(strips):
+        """
+        Resolve strips to their physical strips.
+        Returns (physical_strips, requested) where physical_strips has no
+        duplicates and requested counts the shows calling show() on each
+        strip would have caused.
+        """
+        physical = {}
+        requested = 0
+        for strip in strips:
+            for physical_strip in physical_strips_of(strip):
+                physical[physical_strip] = None
+                requested += 1
+        return list(physical), requested
+
+    def commit(self, strips, stats=None):
+        """
+        Show every physical strip behind strips at most once, return the
+        physical strips.  If stats (a FrameStats) is given, each transmit
+        is timed into it.
+        """
+        physical, requested = self.resolve(strips)
+        self.duplicate_shows_avoided += requested - len(physical)
+        physical = self.with_keepalives(physical)
+        self.send_all(physical, stats)
+        return physical
+
+    def with_keepalives(self, physical):
+        """
+        Return physical plus every strip committed before whose keepalive
+        resend is due, so strips no effect touches still get resent.
+        """
+        if self.keepalive is None or not self.skip_unchanged:
+            return physical
+        now = time.monotonic()
+        wanted = set(physical)
+        due = [strip for strip in self._strips
+               if strip not in wanted and now - getattr(strip, 'sent_at', now) >= self.keepalive]
+        return physical + due if due else physical
+
+    def send_all(self, physical, stats=None, buffers=None):
+        """
+        Send a frame's physical strips, in parallel if there are lanes.
+        buffers optionally maps strips to pixel arrays to send in place of
+        their frames.
+        """
+        if self.lanes is not None and len(physical) > 1:
+            for strip, sent, elapsed in self.lanes.transmit(physical, buffers):
+                self._count(strip, sent)
+                if stats is not None:
+                    stats.record('show' if sent else 'show_skipped', self.labels(strip), elapsed)
+        elif stats is None and buffers is None:
+            for strip in physical:
+                self.transmit(strip)
+        else:
+            for strip in physical:
+                t0 = time.perf_counter()
+                sent = self.transmit(strip, buffers.get(strip) if buffers else None)
+                if stats is not None:
+                    stats.record('show' if sent else 'show_skipped', self.labels(strip),
+                                 time.perf_counter() - t0)
+
+        self.frames += 1
+
+    def send(self, strip, pixels=None):
+        """
+        Send one physical strip to the wire if needed, return True if it
+        was sent.  pixels is sent in place of the strip's frame if given.
+        Safe to call from a transmit lane thread.
+        """
+        if self.skip_unchanged and hasattr(strip, 'show_if_changed'):
+            return strip.show_if_changed(self.keepalive, pixels)
+        if pixels is not None:
+            strip.show_pixels(pixels)
+        else:
+            strip.show()
+        return True
+
+    def transmit(self, strip, pixels=None):
+        """Send one physical strip to the wire if needed and count it, return True if it was sent."""
+        sent = self.send(strip, pixels)
+        self._count(strip, sent)
+        return sent
+
+    def _count(self, strip, sent):
+        if sent:
+            self.shows += 1
+        else:
+            self.skipped_shows += 1
+
+        if strip not in self._strips:
+            self._strips.append(strip)
+
+    def strip_stats(self):
+        """Return {strip label: {'sent': n, 'skipped': n}} for every strip committed so far."""
+        return {
+            self.labels(strip): {
+                'sent': getattr(strip, 'frames_sent', 0),
+                'skipped': getattr(strip, 'frames_skipped', 0),
+            }
+            for strip in self._strips
+        }
+
+    def close(self):
+        """Stop the transmit lane threads, if any.  They restart on the next commit."""
+        if self.lanes is not None:
+            self.lanes.close()
+
+    def stats(self):
+        """Return the commit counters as a dict."""
+        return {
+            'frames': self.frames,
+            'shows': self.shows,
+            'skipped_shows': self.skipped_shows,
+            'duplicate_shows_avoided': self.duplicate_shows_avoided,
+            'strips': self.strip_stats(),
+        }
@@ -0,0 +1,214 @@
+"""
+Deadline based frame pacing for the Dispatcher.
+
+Instead of sleeping frame_time minus however long the frame took, which
+lets error pile up and goes wrong whenever the wall clock is stepped,
+the pacer keeps an absolute deadline per frame on the show clock
+(monotonic by default, see clock.py) and sleeps until it.  When a frame
+overruns its deadline it either drops the missed frames to stay on the
+original frame grid or runs late and restarts the grid from there.
+"""
+
+import clock
+
+from frame_stats import RollingHistogram
+
+
+class FramePacer:
+    """Sleeps to absolute per-frame deadlines and keeps lateness and jitter statistics."""
+
+    # With overrun='drop', a frame has to be at least this fraction of a
+    # frame late before slots are dropped, a slightly late one just runs
+    # the next frame straight away on the same grid
+    DROP_FRACTION = 0.25
+
+    def __init__(self, fps, overrun='drop'):
+        """
+        Args:
+            fps: Target frame rate
+            overrun: What to do when a frame misses its deadline.  'drop'
+                skips the frame slots that were missed and waits for the
+                next one on the original grid, so animation stays in phase
+                with scheduled events, unless the frame is less than
+                DROP_FRACTION of a frame late.  'resync' starts the next frame
+                right away and restarts the grid from there.
+        """
+        if overrun not in ('drop', 'resync'):
+            raise ValueError(f"Unknown overrun policy {overrun!r}, expected 'drop' or 'resync'")
+
+        self.frame_time = 1.0 / fps
+        self.overrun = overrun
+        self.next_deadline = None
+
+        # Statistics
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.max_lateness = 0.0
+        self.jitter = RollingHistogram()
+
+    def start(self):
+        """Start a new frame grid with the first deadline one frame from now."""
+        self.next_deadline = clock.now() + self.frame_time
+
+    def deadline(self):
+        """Return the clock time the current frame's deadline falls at."""
+        if self.next_deadline is None:
+            self.start()
+        return self.next_deadline
+
+    def wait(self):
+        """Sleep until the current frame's deadline, then set up the next deadline."""
+        if self.next_deadline is None:
+            self.start()
+
+        self.frames += 1
+        deadline = self.next_deadline
+        now = clock.now()
+
+        if now < deadline:
+            clock.sleep(deadline - now)
+            # How far past the deadline the OS actually woke us
+            self.jitter.add(clock.now() - deadline)
+            self.next_deadline = deadline + self.frame_time
+            return
+
+        # The frame overran its deadline
+        lateness = now - deadline
+        self.late_frames += 1
+        self.max_lateness = max(self.max_lateness, lateness)
+
+        if self.overrun == 'drop' and lateness < self.frame_time * self.DROP_FRACTION:
+            # Barely late, start the next frame now, it is still due on the grid
+            self.next_deadline = deadline + self.frame_time
+        elif self.overrun == 'drop':
+            # Skip every slot we are already past and wait for the next one
+            missed = int(lateness / self.frame_time) + 1
+            self.dropped_frames += missed
+            deadline += missed * self.frame_time
+            clock.sleep(max(0.0, deadline - clock.now()))
+            self.next_deadline = deadline + self.frame_time
+        else:
+            # Run late and start the grid over from here
+            self.next_deadline = now + self.frame_time
+
+    def stats(self):
+        """Return pacing statistics as a dict, times in seconds."""
+        jitter = self.jitter.summary()
+        return {
+            'frames': self.frames,
+            'late_frames': self.late_frames,
+            'dropped_frames': self.dropped_frames,
+            'max_lateness': self.max_lateness,
+            'jitter_mean': jitter['mean'],
+            'jitter_p99': jitter['p99'],
+            'jitter_max': jitter['max'],
+        }
+
+
+class AdaptivePacer:
+    """
+    Paces frames at a rate that follows how often the content changes.
+
+    The rate jumps to max_fps whenever a frame changes what is on the
+    strips, and halves after every decay_frames frames in a row that
+    don't, down to min_fps.  When nothing is animating at all the loop
+    sleeps straight through to the next thing due to happen.  Time spent
+    at each rate, and idle, is kept for stats().
+    """
+
+    def __init__(self, min_fps, max_fps, decay_frames=3):
+        """
+        Args:
+            min_fps: Slowest frame rate while anything is animating
+            max_fps: Frame rate while the content is changing
+            decay_frames: Unchanged frames in a row before the rate halves
+        """
+        if not 0 < min_fps <= max_fps:
+            raise ValueError(f"Need 0 < min_fps <= max_fps, got {min_fps} and {max_fps}")
+
+        # The rates the pacer steps between, max_fps halving down to min_fps
+        self.rates = [max_fps]
+        while self.rates[-1] / 2 > min_fps:
+            self.rates.append(self.rates[-1] / 2)
+        if self.rates[-1] != min_fps:
+            self.rates.append(min_fps)
+
+        self.decay_frames = decay_frames
+        self.level = 0
+        self.unchanged = 0
+        self.frame_start = None
+
+        # Statistics
+        self.frames = 0
+        self.idle_sleeps = 0
+        self.band_seconds = {}
+
+    @property
+    def fps(self):
+        """The current frame rate."""
+        return self.rates[self.level]
+
+    def start(self):
+        """Start pacing from now at the full frame rate."""
+        self.level = 0
+        self.unchanged = 0
+        self.frame_start = clock.now()
+
+    def _account(self, band, now):
+        self.band_seconds[band] = self.band_seconds.get(band, 0.0) + (now - self.frame_start)
+        self.frame_start = now
+
+    def deadline(self):
+        """Return the clock time the next frame is due at the current rate."""
+        if self.frame_start is None:
+            self.start()
+        return self.frame_start + 1.0 / self.fps
+
+    def wait(self, changed, idle_until=None):
+        """
+        Sleep until the next frame is due.
+        changed: whether the frame just rendered changed any strip
+        idle_until: if nothing is animating, the clock.now() at which
+            something next needs doing.  The pacer sleeps until then,
+            however long that is.
+        """
+        if self.frame_start is None:
+            self.start()
+        self.frames += 1
+
+        if idle_until is not None:
+            self.idle_sleeps += 1
+            delay = idle_until - clock.now()
+            if delay > 0:
+                clock.sleep(delay)
+            # Whatever wakes us starts out at full speed
+            self.level = 0
+            self.unchanged = 0
+            self._account('idle', clock.now())
+            return
+
+        band = f"{self.fps:g}"
+        deadline = self.frame_start + 1.0 / self.fps
+        now = clock.now()
+        if now < deadline:
+            clock.sleep(deadline - now)
+        self._account(band, clock.now())
+
+        if changed:
+            self.level = 0
+            self.unchanged = 0
+        else:
+            self.unchanged += 1
+            if self.unchanged >= self.decay_frames and self.level < len(self.rates) - 1:
+                self.level += 1
+                self.unchanged = 0
+
+    def stats(self):
+        """Return pacing statistics as a dict, band times in seconds keyed by frame rate."""
+        return {
+            'frames': self.frames,
+            'fps': self.fps,
+            'idle_sleeps': self.idle_sleeps,
+            'band_seconds': dict(self.band_seconds),
+        }
@@ -0,0 +1,209 @@
+"""
+Pipelined output for the Dispatcher.
+
+Normally a frame is rendered, shown, and only then is the next one
+rendered, so any hiccup in Python (a garbage collection, decoding the
+next image) shows up on the LEDs as a stutter.  In pipelined mode the
+Dispatcher renders up to depth frames ahead of the wire, each stamped
+with the clock time it should be shown at, and snapshots the
+physical strips' pixels into a small ring of preallocated buffers.  A
+transmit thread takes the frames off the queue and sends each one at its
+target time, so a slow frame only eats into the buffer.
+
+The price is latency: what is on the LEDs is about depth frames behind
+what was just rendered.  The effects are rendered as of their target
+time, so animation stays in step with the schedule.
+"""
+
+import queue
+import threading
+
+import numpy as np
+
+import clock
+from frame_stats import RollingHistogram
+
+
+class FramePipeline:
+    """Queues rendered frames and transmits them on schedule from a separate thread."""
+
+    def __init__(self, frame_commit, fps, depth=2, stats=None, on_thread_start=None):
+        """
+        Args:
+            frame_commit: FrameCommit to send the frames with
+            fps: Target frame rate
+            depth: How many frames the renderer may run ahead of the wire
+            stats: Optional FrameStats to time the transmits into
+            on_thread_start: Optional callable run first thing in the
+                transmit thread, to pin or prioritize it say
+        """
+        if depth < 1:
+            raise ValueError(f"Pipeline depth must be at least 1, got {depth}")
+
+        self.frame_commit = frame_commit
+        self.frame_time = 1.0 / fps
+        self.depth = depth
+        self.frame_stats = stats
+        self.on_thread_start = on_thread_start
+
+        self._queue = queue.Queue(maxsize=depth)
+        self._thread = None
+        self._error = None
+
+        # Per physical strip, a ring of snapshot buffers and the next one
+        # to fill.  depth queued, one being sent and one being filled.
+        self._rings = {}
+        self._ring_index = {}
+
+        # Target time of the next frame and of the one being rendered
+        self._next_target = None
+        self._target = None
+
+        # Statistics
+        self.frames = 0
+        self.late_renders = 0
+        self.skipped_slots = 0
+        self.underruns = 0
+        self.depth_histogram = RollingHistogram()
+        self.latency = RollingHistogram()
+        self.lateness = RollingHistogram()
+
+    def start(self):
+        """Start a new frame grid with the first frame due one frame from now."""
+        self._next_target = clock.now() + self.frame_time
+        self._target = None
+
+    def frame_target(self):
+        """
+        Return the clock time the frame being rendered will be shown
+        at.  If the renderer has fallen behind the wire, the slots it
+        missed are skipped.
+        """
+        if self._target is not None:
+            return self._target
+        if self._next_target is None:
+            self.start()
+
+        now = clock.now()
+        target = self._next_target
+        if target < now:
+            # Nothing was rendered for these slots, skip them so the frame
+            # grid stays in phase with the schedule
+            missed = int((now - target) / self.frame_time) + 1
+            self.late_renders += 1
+            self.skipped_slots += missed
+            target += missed * self.frame_time
+        self._target = target
+        return target
+
+    def _snapshot(self, strip):
+        """Copy a physical strip's frame into its next ring buffer and return the buffer."""
+        frame = getattr(strip, 'frame', None)
+        if frame is None:
+            raise ValueError(f"Pipelined output needs numpy buffer mode strips, {strip!r} has no frame")
+
+        ring = self._rings.get(strip)
+        if ring is None or len(ring[0]) != len(frame):
+            ring = self._rings[strip] = [np.empty_like(frame) for _ in range(self.depth + 2)]
+            self._ring_index[strip] = 0
+
+        index = self._ring_index[strip]
+        self._ring_index[strip] = (index + 1) % len(ring)
+        buffer = ring[index]
+        np.copyto(buffer, frame)
+        return buffer
+
+    def submit(self, physical, rendered_at):
+        """
+        Snapshot the physical strips and queue them to be sent at the
+        frame's target time.  Blocks while the queue is full.
+        rendered_at: clock.now() when rendering of the frame began
+        """
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="frame-pipeline", daemon=True)
+            self._thread.start()
+
+        target = self.frame_target()
+        buffers = {strip: self._snapshot(strip) for strip in physical}
+        self._queue.put((target, rendered_at, physical, buffers))
+
+        self._target = None
+        self._next_target = target + self.frame_time
+        self.frames += 1
+
+    def slack(self):
+        """
+        Return the seconds until the transmit thread may next have a frame
+        to send, the target of the oldest one it could be holding.  The
+        render thread keeping the interpreter busy past then makes it late.
+        """
+        if self._next_target is None:
+            return 0.0
+        held = self._queue.qsize() + 1
+        return self._next_target - held * self.frame_time - clock.now()
+
+    def _run(self):
+        """The transmit thread, sends each queued frame at its target time."""
+        if self.on_thread_start is not None:
+            self.on_thread_start()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+                starved = False
+            except queue.Empty:
+                item = self._queue.get()
+                starved = True
+            if item is None:
+                return
+
+            target, rendered_at, physical, buffers = item
+            # Frames still waiting behind this one
+            self.depth_histogram.add(self._queue.qsize())
+
+            now = clock.now()
+            if now < target:
+                clock.sleep(target - now)
+            elif starved:
+                # The wire was waiting on the renderer
+                self.underruns += 1
+
+            self.lateness.add(clock.now() - target)
+            try:
+                self.frame_commit.send_all(physical, self.frame_stats, buffers)
+            except BaseException as e:
+                self._error = e
+            self.latency.add(clock.now() - rendered_at)
+
+    def close(self):
+        """
+        Send the frames still queued, then stop the transmit thread.
+        Raises the error sending any of them raised, as submit() would have.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self.frame_commit.close()
+        self._next_target = None
+        self._target = None
+
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def stats(self):
+        """Return pipeline statistics as a dict, times in milliseconds."""
+        return {
+            'depth': self.depth,
+            'frames': self.frames,
+            'late_renders': self.late_renders,
+            'skipped_slots': self.skipped_slots,
+            'underruns': self.underruns,
+            'queue_depth': self.depth_histogram.summary(),
+            'latency': self.latency.summary(scale=1000.0),
+            'lateness': self.lateness.summary(scale=1000.0),
+        }
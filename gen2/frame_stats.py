@@ -0,0 +1,106 @@
+"""
+Optional timing instrumentation for the Dispatcher's frame loop.
+
+When enabled, the Dispatcher times every effect's step(), every strip's
+background copy and every physical strip's show(), and keeps a rolling
+window of samples per (phase, key) so it can report p50/p99/max.
+"""
+
+import time
+from collections import deque
+
+
+# How many recent samples each histogram keeps
+HISTORY = 1000
+
+
+class StripLabels:
+    """Stable names for strips in statistics, numbered in the order they are first seen."""
+
+    def __init__(self):
+        self._labels = {}
+        self._counts = {}
+
+    def __call__(self, strip):
+        """
+        Return the strip's label, its name attribute if it has one,
+        otherwise class name and a sequence number.
+        """
+        label = self._labels.get(strip)
+        if label is None:
+            label = getattr(strip, 'name', None)
+            if label is None:
+                kind = type(strip).__name__
+                label = f"{kind}#{self._counts.get(kind, 0)}"
+                self._counts[kind] = self._counts.get(kind, 0) + 1
+            self._labels[strip] = label
+        return label
+
+
+class RollingHistogram:
+    """Keeps the most recent samples of a measurement and summarizes them."""
+
+    def __init__(self, history=HISTORY):
+        self.samples = deque(maxlen=history)
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def summary(self, scale=1.0):
+        """Return count, mean, p50, p99 and max of the recent samples, multiplied by scale."""
+        if not self.samples:
+            return {'count': self.count, 'mean': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        ordered = sorted(self.samples)
+        n = len(ordered)
+        return {
+            'count': self.count,
+            'mean': sum(ordered) / n * scale,
+            'p50': ordered[n // 2] * scale,
+            'p99': ordered[min(n - 1, int(n * 0.99))] * scale,
+            'max': ordered[-1] * scale,
+        }
+
+
+class FrameStats:
+    """Per-phase timing histograms for the frame loop, keyed by effect class or strip."""
+
+    def __init__(self, history=HISTORY, labels=None):
+        """
+        Args:
+            history: How many recent samples each histogram keeps
+            labels: StripLabels to name strips with, shared with the
+                FrameCommit so both report a strip under the same name
+        """
+        self.history = history
+        self.labels = labels if labels is not None else StripLabels()
+        self.phases = {}
+
+    def record(self, phase, key, seconds):
+        """Add a timing sample for key in phase."""
+        histograms = self.phases.setdefault(phase, {})
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = RollingHistogram(self.history)
+        histogram.add(seconds)
+
+    def timed_step(self, effect, elapsed):
+        """Step an effect, timing it under its class name."""
+        t0 = time.perf_counter()
+        result = effect.step(elapsed)
+        self.record('step', type(effect).__name__, time.perf_counter() - t0)
+        return result
+
+    def timed_call(self, phase, strip, method):
+        """Call method, timing it under the strip's label."""
+        t0 = time.perf_counter()
+        method()
+        self.record(phase, self.labels(strip), time.perf_counter() - t0)
+
+    def stats(self):
+        """Return {phase: {key: {count, mean, p50, p99, max}}} with times in milliseconds."""
+        return {
+            phase: {key: histogram.summary(scale=1000.0) for key, histogram in histograms.items()}
+            for phase, histograms in self.phases.items()
+        }
@@ -0,0 +1,138 @@
+"""
+Keeping garbage collection out of the frames.
+
+Python's cycle collector runs whenever enough objects have been allocated
+since it last ran, in the middle of whatever happens to be running.  The
+frame loop allocates plenty, color tuples, lists of sparkles, lambdas,
+and every so often a frame picks up a collection of the oldest generation
+and visibly hitches.
+
+SlackCollector turns automatic collection off while a show runs and
+collects in the slack between a frame going out and the next one being
+due instead.  Each frame it collects the generation the collector would
+have collected by itself, provided its collections have been fitting in
+the slack there is; otherwise it makes do with a younger generation and
+the older one waits for a frame with more room, an idle stretch say.
+Objects that exist when the show starts are frozen out of collection, so
+a full collection only walks what the show allocated since.  Reference
+counting still frees everything not caught in a cycle the moment it goes,
+only cycles wait for the slack.
+"""
+
+import gc
+import time
+
+from frame_stats import RollingHistogram
+
+
+class SlackCollector:
+    """Runs the garbage collector only in the slack after each frame and times it."""
+
+    # Collect a generation even without the slack once its count has
+    # reached this many times its threshold, so memory can't grow unchecked
+    OVERDUE = 10
+
+    # How quickly the estimate of a generation's collection time forgets
+    # a slow collection, per collection of that generation
+    COST_DECAY = 0.9
+
+    def __init__(self, margin=0.001, freeze=True):
+        """
+        Args:
+            margin: Seconds of the slack to leave for waking up on time
+            freeze: Collect once at start() and freeze everything that
+                survives, so later collections don't walk it
+        """
+        self.margin = margin
+        self.freeze = freeze
+        self.thresholds = gc.get_threshold()
+        self._was_enabled = None
+
+        # Pessimistic seconds a collection of each generation takes
+        self.cost = [0.0, 0.0, 0.0]
+
+        # Statistics
+        self.collections = [0, 0, 0]
+        self.deferred = 0
+        self.forced = 0
+        self.pause = RollingHistogram()
+        self.by_generation = [RollingHistogram() for _ in range(3)]
+
+    def start(self):
+        """Turn off automatic collection until stop()."""
+        self._was_enabled = gc.isenabled()
+        gc.disable()
+        if self.freeze:
+            gc.collect()
+            gc.freeze()
+
+    def stop(self):
+        """Put automatic collection back the way start() found it, if it was started."""
+        if self._was_enabled is None:
+            return
+        if self.freeze:
+            gc.unfreeze()
+        if self._was_enabled:
+            gc.enable()
+        self._was_enabled = None
+
+    def _due(self):
+        """Return the oldest generation the collector would collect by now, or None."""
+        counts = gc.get_count()
+        due = None
+        for generation, threshold in enumerate(self.thresholds):
+            if not threshold or counts[generation] <= threshold:
+                break
+            due = generation
+        return due
+
+    def _overdue(self):
+        """Return the oldest generation left OVERDUE times past its threshold, or None."""
+        counts = gc.get_count()
+        for generation in reversed(range(len(self.thresholds))):
+            threshold = self.thresholds[generation]
+            if threshold and counts[generation] >= threshold * self.OVERDUE:
+                return generation
+        return None
+
+    def collect(self, slack):
+        """
+        Collect whatever is due that fits in slack seconds, or is overdue
+        however short the slack, and return the seconds spent collecting.
+        """
+        spent = 0.0
+        due = self._due()
+        overdue = self._overdue()
+        if due is not None or overdue is not None:
+            # The oldest generation that is due and fits in the slack
+            generation = due
+            while generation is not None and self.cost[generation] + self.margin > slack:
+                generation = generation - 1 if generation > 0 else None
+            if overdue is not None and (generation is None or overdue > generation):
+                generation = overdue
+                self.forced += 1
+            if due is not None and (generation is None or generation < due):
+                self.deferred += 1
+
+            if generation is not None:
+                t0 = time.perf_counter()
+                gc.collect(generation)
+                spent = time.perf_counter() - t0
+
+                self.collections[generation] += 1
+                self.by_generation[generation].add(spent)
+                self.cost[generation] = max(spent, self.cost[generation] * self.COST_DECAY)
+
+        # Every frame, so the histogram shows how many frames paid nothing
+        self.pause.add(spent)
+        return spent
+
+    def stats(self):
+        """Return collections and pause times per generation and the per frame pause, in milliseconds."""
+        return {
+            'collections': list(self.collections),
+            'deferred': self.deferred,
+            'forced': self.forced,
+            'frame_pause_ms': self.pause.summary(scale=1000.0),
+            'generation_pause_ms': [history.summary(scale=1000.0) for history in self.by_generation],
+        }
@@ -50,7 +50,6 @@ def run_demo(strips):
             lambda tl=timeline: dispatcher.run_background_effect(tl.wipe3.start(r=0, g=20, b=100, duration=3.0)),
             lambda tl=timeline: dispatcher.run_background_effect(tl.fade.start(r=20, g=0, b=20, duration=3.0)),
         ])
-        wipe_chain.dispatcher = dispatcher
         dispatcher.schedule(0.0, lambda wc=wipe_chain: dispatcher.run_background_effect(wc.start()))
 
 
@@ -62,7 +61,7 @@ def run_demo(strips):
 
     # 14.0s: Blackout both strips before pulses
     for strip in physical_strips:
-        dispatcher.schedule(14.0, lambda s=strip: s.blackout())
+        dispatcher.schedule(14.0, lambda s=strip: dispatcher.blackout(s))
 
     # 14.5s: First pulse on both strips
     for timeline in timelines:
@@ -72,7 +71,7 @@ def run_demo(strips):
 
     # 17.0s: Blackout both strips
     for strip in physical_strips:
-        dispatcher.schedule(17.0, lambda s=strip: s.blackout())
+        dispatcher.schedule(17.0, lambda s=strip: dispatcher.blackout(s))
 
     # 17.5s: Second pulse on both strips
     for timeline in timelines:
@@ -82,7 +81,7 @@ def run_demo(strips):
 
     # 20.0s: Blackout both strips
     for strip in physical_strips:
-        dispatcher.schedule(20.0, lambda s=strip: s.blackout())
+        dispatcher.schedule(20.0, lambda s=strip: dispatcher.blackout(s))
 
     # 20.5s: Sparkles for 5 seconds on both strips
     for timeline in timelines:
@@ -92,7 +91,7 @@ def run_demo(strips):
 
     # 26.0s: Blackout both strips
     for strip in physical_strips:
-        dispatcher.schedule(26.0, lambda s=strip: s.blackout())
+        dispatcher.schedule(26.0, lambda s=strip: dispatcher.blackout(s))
 
     # 26.5s: Two chases and sparkles running together for 10s on both strips
     for timeline in timelines:
@@ -108,7 +107,7 @@ def run_demo(strips):
 
     # 37.0s: Final blackout on both strips
     for strip in physical_strips:
-        dispatcher.schedule(37.0, lambda s=strip: s.blackout())
+        dispatcher.schedule(37.0, lambda s=strip: dispatcher.blackout(s))
 
     # --- Run the animation ---
     # The dispatcher will now run until all scheduled events and effects are complete.
@@ -2,20 +2,25 @@
 
 import time
 import sys
-import random
 
 from hardware import *
 from dispatcher import *
 from physical_strip import PhysicalStrip
+from show_random import unseeded_rng
 
 strip = initialize_strip()
 
-def run_demo(strip):
-    """Run the HighStriker demo with multiple overlapping strikes."""
+def run_demo(strip, seed=None):
+    """
+    Run the HighStriker demo with multiple overlapping strikes.
+    seed: Show seed, the same seed gives the same strikes every run
+    """
 
     # Create dispatcher and a timeline to hold our effect instances
-    dispatcher = Dispatcher()
+    dispatcher = Dispatcher(seed=seed)
     timeline = Timeline()
+    show_seed = dispatcher.show_seed
+    rng = show_seed.rng_for('high_striker_demo') if show_seed is not None else unseeded_rng()
 
     # --- Parameters for the demo ---
     total_strikes = 10
@@ -43,10 +48,10 @@ def run_demo(strip):
     
     for i in range(total_strikes):
         # Random velocity for this strike
-        velocity = random.uniform(min_velocity, max_velocity)
+        velocity = rng.uniform(min_velocity, max_velocity)
         
         # Random color
-        r, g, b = random.choice(colors)
+        r, g, b = colors[rng.integers(len(colors))]
         
         puck_size = 3
         
@@ -64,7 +69,7 @@ def run_demo(strip):
         
         # Wait before next strike
         if i < total_strikes - 1:  # Don't wait after the last one
-            wait_time = random.uniform(min_launch_interval, max_launch_interval)
+            wait_time = rng.uniform(min_launch_interval, max_launch_interval)
             current_time += wait_time
         
         print(f"Strike {i+1}: velocity={velocity:.1f}%, color=({r},{g},{b}), size={puck_size:.1f}%, time={current_time:.2f}s")
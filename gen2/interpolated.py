@@ -0,0 +1,146 @@
+"""
+Running heavy effects at a lower simulation rate.
+
+Physics-ish effects (HighStriker, NewtonsCradle, BowWave's particles)
+cost the same every frame however little they move between frames.
+Interpolated runs such an effect at its own rate, 25 Hz say, into an
+in-memory BufferStrip, keeps the two most recent states it rendered, one
+either side of the frame being shown, and blends between them at the
+Dispatcher's output rate.  The effect costs a fraction of the CPU and
+the output still moves smoothly.
+
+The BufferStrip's background is kept in step with the real strip's, so
+effects that build on what is already there, a wipe over an earlier
+color or a fade from the current one, work as they would run directly.
+The effect is rendered one simulation step ahead of the output, which is
+fine for effects drawn from their elapsed time.  Blending crossfades
+rather than tracking motion, so a fast moving puck smears slightly
+between its two positions rather than sliding.
+
+    dispatcher.run_foreground_effect(
+        Interpolated(strip, HighStriker, sim_rate=25).start(r=255))
+"""
+
+import numpy as np
+
+from buffer_strip import BufferStrip
+from dispatcher import Effect, BackgroundEffect
+from pixel_buffer import channel_view
+
+
+class Interpolated(Effect):
+    """Runs an effect at sim_rate and blends its states up to the output frame rate."""
+
+    def __init__(self, strip, effect_class, sim_rate=25.0):
+        """
+        Args:
+            strip: The strip to show the effect on
+            effect_class: The Effect class to run, it gets a BufferStrip the
+                width of strip
+            sim_rate: Steps per second to run the effect at
+        """
+        super().__init__(strip)
+        self.sim_rate = sim_rate
+        self.buffer = BufferStrip(strip.width, name=f"{effect_class.__name__} sim")
+        self._sync_background()
+        self.effect = effect_class(self.buffer)
+
+        self.is_background = isinstance(self.effect, BackgroundEffect)
+        if self.is_background:
+            self.background = strip.background
+            # Every blend covers the strip only if every state does, that
+            # is if the effect writes every pixel on every step
+            self.opaque = self.effect.opaque
+
+    def init(self, **kwargs):
+        self.tick = 1.0 / self.sim_rate
+        # The effect may capture the background as it starts, a fade's
+        # starting colors say
+        self._sync_background()
+        self.effect.start(**kwargs)
+        # So the dispatcher knows when it is due to end
+        self.duration = getattr(self.effect, 'duration', None)
+
+        # The states either side of the output frame, as (time, pixels,
+        # drawn mask), and when the effect finished, if it has
+        self.states = None
+        self.ends_at = None
+
+    def _sync_background(self):
+        """Bring the buffer's background up to date with the strip's."""
+        background = self.strip.background
+        if isinstance(background, np.ndarray):
+            self.buffer.background[:] = background
+        else:
+            self.buffer.background[:] = [background[i] for i in range(self.strip.width)]
+
+    def _render(self, sim_time):
+        """Step the effect to sim_time and return its state."""
+        buffer = self.buffer
+        if self.ends_at is None:
+            self._sync_background()
+            if not self.is_background:
+                # Foreground effects draw over the background, as on a strip
+                buffer.frame[:] = buffer.background
+                buffer.track_touches()
+            if not self.effect.step(sim_time):
+                self.ends_at = sim_time
+                self.effect.complete()
+        if self.is_background:
+            return sim_time, buffer.background.copy(), None
+        drawn = np.zeros(buffer.width, dtype=bool)
+        drawn[buffer.touched] = True
+        return sim_time, buffer.frame.copy(), drawn
+
+    def step(self, elapsed_time):
+        tick = self.tick
+        if self.states is None or elapsed_time >= self.states[1][0] + tick:
+            # Starting, or so far behind both states are stale
+            start = (elapsed_time // tick) * tick
+            self.states = [self._render(start), self._render(start + tick)]
+        while elapsed_time >= self.states[1][0]:
+            self.states = [self.states[1], self._render(self.states[1][0] + tick)]
+
+        (t0, before, drawn_before), (t1, after, drawn_after) = self.states
+        self._draw(before, drawn_before, after, drawn_after, (elapsed_time - t0) / (t1 - t0))
+
+        return self.ends_at is None or elapsed_time < self.ends_at
+
+    def _draw(self, before, drawn_before, after, drawn_after, fraction):
+        """Put the blend of two states, fraction of the way from before to after, on the strip."""
+        if self.is_background:
+            blended = _blend(before, after, fraction)
+            if isinstance(self.background, np.ndarray):
+                self.background[:] = blended
+            else:
+                self.background[:] = blended.tolist()
+            return
+
+        # Pixels only one state drew blend with the background the effect
+        # drew over
+        drawn = np.flatnonzero(drawn_before | drawn_after)
+        if not len(drawn):
+            return
+        under = self.buffer.background[drawn]
+        before = np.where(drawn_before[drawn], before[drawn], under)
+        after = np.where(drawn_after[drawn], after[drawn], under)
+        blended = _blend(before, after, fraction)
+        set_pixel = self.strip.setPixelColor
+        for i, color in zip(drawn.tolist(), blended.tolist()):
+            set_pixel(i, color)
+
+    def seed(self, show_seed):
+        super().seed(show_seed)
+        self.effect.seed(show_seed)
+
+    def seek(self, elapsed_time):
+        self.effect.seek(elapsed_time)
+        self.states = None
+
+
+def _blend(before, after, fraction):
+    """Blend two uint32 pixel arrays channel by channel, fraction of the way to after."""
+    a = channel_view(before).astype(np.float32)
+    b = channel_view(after).astype(np.float32)
+    mixed = np.rint(a + (b - a) * fraction).astype(np.uint8)
+    return mixed.view(np.uint32).reshape(-1)
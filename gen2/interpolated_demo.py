@@ -0,0 +1,67 @@
+# Interpolated demo - heavy effects run at a low simulation rate and blended up to the frame rate
+
+import time
+import sys
+
+from hardware import *
+from dispatcher import *
+from interpolated import Interpolated
+from physical_strip import PhysicalStrip
+
+strip = initialize_strip()
+
+def run_demo(strip, sim_rate=20):
+    """
+    Run a wipe and a fade over an existing background, then high striker
+    pucks over the result, all simulated at sim_rate and shown at 100 fps.
+    """
+
+    # Create dispatcher and a timeline to hold our effect instances
+    dispatcher = Dispatcher(fps=100)
+    timeline = Timeline()
+
+    # --- Instantiate all effects and store them on the timeline ---
+    timeline.base = FadeBackground(strip)
+    timeline.wipe = Interpolated(strip, WipeLowHigh, sim_rate=sim_rate)
+    timeline.fade = Interpolated(strip, FadeBackground, sim_rate=sim_rate)
+    timeline.pucks = [Interpolated(strip, HighStriker, sim_rate=sim_rate) for _ in range(3)]
+
+    # --- Schedule all actions ---
+
+    # 0.0s: Fade up to dim blue, the background the interpolated effects build on
+    dispatcher.schedule(0.0, lambda: dispatcher.run_background_effect(
+        timeline.base.start(r=0, g=0, b=64, duration=1.0)
+    ))
+
+    # 1.5s: Wipe green up the blue, the part not yet wiped stays blue
+    dispatcher.schedule(1.5, lambda: dispatcher.run_background_effect(
+        timeline.wipe.start(r=0, g=128, b=0, duration=3.0)
+    ))
+
+    # 5.0s: Fade from the green to dim red
+    dispatcher.schedule(5.0, lambda: dispatcher.run_background_effect(
+        timeline.fade.start(r=64, g=0, b=0, duration=3.0)
+    ))
+
+    # 8.5s: Pucks in a few colors over the red
+    colors = [(255, 255, 0), (0, 255, 255), (255, 255, 255)]
+    for i, (puck, (r, g, b)) in enumerate(zip(timeline.pucks, colors)):
+        dispatcher.schedule(8.5 + i * 0.7, lambda puck=puck, r=r, g=g, b=b, i=i: dispatcher.run_foreground_effect(
+            puck.start(r=r, g=g, b=b, launch_velocity_pct_per_sec=80.0 + i * 10.0)
+        ))
+
+    # --- Run the animation ---
+    # The dispatcher will now run until all scheduled events and effects are complete.
+    dispatcher.run()
+
+    print("Interpolated demo complete.")
+    strip.blackout()
+
+
+if __name__ == "__main__":
+    try:
+        run_demo(strip, sim_rate=float(sys.argv[1]) if len(sys.argv) > 1 else 20)
+    except KeyboardInterrupt:
+        # Clean up and exit gracefully
+        print("\nKeyboard interrupt received. Turning off LEDs and exiting...")
+        strip.blackout()
@@ -6,15 +6,27 @@ support for reversed pixel ranges.
 
 from rpi_ws281x import Color
 from physical_strip import PhysicalStrip
+from pixel_buffer import new_pixel_buffer
+from segment_map import SegmentMap
+from touch_tracking import TouchTrackingMixin
 
 
-class LogicalStrip:
+class LogicalStrip(TouchTrackingMixin):
     """Maps logical strip pixels to one or more physical strips."""
 
-    def __init__(self):
-        """Initialize an empty logical strip."""
-        # Array to store pixel mappings - each element is (strip, physical_pixel_index)
-        self._pixel_map = []
+    def __init__(self, buffer_mode='list'):
+        """
+        Initialize an empty logical strip.
+
+        Args:
+            buffer_mode: 'list' or 'numpy' for the background buffer, see PhysicalStrip
+        """
+        if buffer_mode not in ('list', 'numpy'):
+            raise ValueError(f"Unknown buffer mode {buffer_mode!r}, expected 'list' or 'numpy'")
+        self.buffer_mode = buffer_mode
+
+        # Run-length pixel map - one segment per run of consecutive physical pixels
+        self._segments = SegmentMap()
         self.width = 0
 
         # Background buffer for the logical strip
@@ -47,19 +59,15 @@ class LogicalStrip:
         if min_pixel < 0 or max_pixel >= strip.numPixels():
             raise ValueError(f"Pixel range {start_pixel}-{end_pixel} out of bounds for strip with {strip.numPixels()} pixels")
 
-        # Determine direction and add pixels
-        if start_pixel <= end_pixel:
-            # Forward direction
-            for i in range(start_pixel, end_pixel + 1):
-                self._pixel_map.append((strip, i))
-        else:
-            # Reverse direction
-            for i in range(start_pixel, end_pixel - 1, -1):
-                self._pixel_map.append((strip, i))
+        # Add the run, direction is worked out by the segment map
+        self._segments.add_range(strip, start_pixel, end_pixel)
 
         # Update width and background buffer
-        self.width = len(self._pixel_map)
-        self.background = [Color(0, 0, 0)] * self.width
+        self.width = self._segments.width
+        if self.buffer_mode == 'numpy':
+            self.background = new_pixel_buffer(self.width)
+        else:
+            self.background = [Color(0, 0, 0)] * self.width
 
         # Update cached physical strips set
         self._physical_strips.add(strip)
@@ -75,8 +83,10 @@ class LogicalStrip:
         if n < 0 or n >= self.width:
             return  # Ignore out of bounds pixels
 
-        strip, physical_idx = self._pixel_map[n]
+        strip, physical_idx = self._segments.locate(n)
         strip.setPixelColor(physical_idx, color)
+        if self.touched is not None:
+            self.touched.append(n)
 
     def numPixels(self):
         """Return the number of pixels in the virtual strip."""
@@ -91,18 +101,21 @@ class LogicalStrip:
     def set_background(self, r=0, g=0, b=0):
         """Set all background pixels to a specific color."""
         color = Color(r, g, b)
-        self.background[:] = [color] * self.width
+        if self.buffer_mode == 'numpy':
+            self.background.fill(color)
+        else:
+            self.background[:] = [color] * self.width
+        self._touch_all()
 
     def copy_background_to_strip(self):
-        """Copy the background buffer to the physical strips."""
-        for i in range(self.width):
-            self.setPixelColor(i, self.background[i])
+        """Copy the background buffer to the physical strips, one slice per segment."""
+        self._touch_all()
+        self._segments.copy(self.background)
 
     def copy_color_to_strip(self, r=0, g=0, b=0):
         """Copy a specific color to all pixels."""
-        color = Color(r, g, b)
-        for i in range(self.width):
-            self.setPixelColor(i, color)
+        self._touch_all()
+        self._segments.fill(0, self.width, Color(r, g, b))
 
     def show(self):
         """
@@ -113,6 +126,10 @@ class LogicalStrip:
         for strip in self._physical_strips:
             strip.show()
 
+    def physical_strips(self):
+        """Return the set of physical strips this strip maps onto."""
+        return self._physical_strips
+
     def __len__(self):
         """Return the number of pixels in the virtual strip."""
         return self.width
@@ -155,8 +172,17 @@ class LogicalStrip:
             self.background[key] = color
         elif isinstance(key, slice):
             # Slice of pixels
-            indices = range(*key.indices(self.width))
-            for i in indices:
+            start, stop, step = key.indices(self.width)
+            if step == 1:
+                # Contiguous, hand whole runs to the segment map
+                self._segments.fill(start, stop, color)
+                self._touch_range(start, stop)
+                if self.buffer_mode == 'numpy':
+                    self.background[start:stop] = color
+                else:
+                    self.background[start:stop] = [color] * max(0, stop - start)
+                return
+            for i in range(start, stop, step):
                 self.setPixelColor(i, color)
                 self.background[i] = color
         else:
@@ -4,14 +4,17 @@ for lightymclightshow effects.
 """
 
 from rpi_ws281x import PixelStrip, Color, ws
+from pixel_buffer import new_pixel_buffer, channel_view, led_array, push_to_leds
+from dirty_tracking import DirtyTrackingMixin
+from touch_tracking import TouchTrackingMixin
 
 
-class PhysicalStrip(PixelStrip):
+class PhysicalStrip(DirtyTrackingMixin, TouchTrackingMixin, PixelStrip):
     """Extends PixelStrip with background buffer and convenience methods."""
 
     def __init__(self, led_count, led_pin, freq_hz,
                  dma, invert, brightness,
-                 channel, strip_type=ws.WS2811_STRIP_GRB):
+                 channel, strip_type=ws.WS2811_STRIP_GRB, buffer_mode='list'):
         """
         Initialize a PhysicalStrip with LED configuration.
 
@@ -24,7 +27,15 @@ class PhysicalStrip(PixelStrip):
             brightness: Set to 0 for darkest and 255 for brightest
             channel: Channel for GPIOs 13, 19, 41, 45 or 53
             strip_type: Strip type configuration (default: WS2811_STRIP_GRB)
+            buffer_mode: 'list' keeps the background as a Python list and
+                writes pixels straight into the driver.  'numpy' keeps the
+                background and the frame being rendered as uint32 ndarrays
+                and pushes the whole frame to the driver in one bulk copy
+                at show() time.
         """
+        if buffer_mode not in ('list', 'numpy'):
+            raise ValueError(f"Unknown buffer mode {buffer_mode!r}, expected 'list' or 'numpy'")
+
         # Initialize parent PixelStrip
         super().__init__(led_count, led_pin, freq_hz, dma, invert,
                         brightness, channel, strip_type=strip_type)
@@ -34,7 +45,15 @@ class PhysicalStrip(PixelStrip):
 
         # Background buffer - what pixels return to each frame
         # Initialize this BEFORE calling begin() to avoid any potential recursion
-        self.background = [Color(0, 0, 0)] * self.width
+        #
+        # In numpy mode there is also a frame buffer that effects render
+        # into; it replaces the driver's LED array until show() is called.
+        if buffer_mode == 'numpy':
+            self.background = new_pixel_buffer(self.width)
+            self.frame = new_pixel_buffer(self.width)
+        else:
+            self.background = [Color(0, 0, 0)] * self.width
+            self.frame = None
 
         # Initialize the library (must be called once before other functions)
         self.begin()
@@ -46,22 +65,88 @@ class PhysicalStrip(PixelStrip):
         self.copy_background_to_strip()
         self.show()
 
+    @property
+    def background_u8(self):
+        """
+        An (N, 4) uint8 view of the numpy background buffer, no copy.
+        Byte columns are B, G, R, W on the Pi.
+        """
+        return channel_view(self.background)
+
     def set_background(self, r=0, g=0, b=0):
         """Set all background pixels to a specific color."""
         color = Color(r, g, b)
-        self.background[:] = [color] * self.width
+        if self.frame is not None:
+            self.background.fill(color)
+        else:
+            self.background[:] = [color] * self.width
+        self._touch_all()
 
     def copy_background_to_strip(self):
         """Copy the background buffer to the physical strip."""
+        self._touch_all()
+        if self.frame is not None:
+            self.frame[:] = self.background
+            return
         for i in range(self.width):
             ws.ws2811_led_set(self._channel, i, self.background[i])
 
     def copy_color_to_strip(self, r=0, g=0, b=0):
         """Copy a specific color to the physical strip."""
         color = Color(r, g, b)
+        self._touch_all()
+        if self.frame is not None:
+            self.frame.fill(color)
+            return
         for i in range(self.width):
             ws.ws2811_led_set(self._channel, i, color)
 
+    def setPixelColor(self, n, color):
+        """Set a pixel color in the frame being rendered."""
+        if self.frame is not None:
+            self.frame[n] = color
+        else:
+            super().setPixelColor(n, color)
+        if self.touched is not None:
+            self.touched.append(n)
+
+    def getPixelColor(self, n):
+        """Get a pixel color from the frame being rendered."""
+        if self.frame is not None:
+            return int(self.frame[n])
+        return super().getPixelColor(n)
+
+    def show(self):
+        """
+        Update the physical strip to show the current pixel values.
+        In numpy mode the whole frame goes into the driver's LED array
+        in one bulk copy first.
+        """
+        self._transmit(self.frame_digest())
+
+    def _transmit(self, digest, pixels=None):
+        """Send the frame, or pixels if given, to the wire and record it as the last one sent."""
+        if pixels is not None:
+            push_to_leds(self._channel, pixels)
+        elif self.frame is not None:
+            push_to_leds(self._channel, self.frame)
+        super().show()
+        self._mark_sent(digest)
+
+    def wire_pixels(self):
+        """Return the pixels show() sends as a uint32 array, or None if unreadable."""
+        if self.frame is not None:
+            return self.frame
+        return led_array(self._channel, self.width)
+
+    def wire_brightness(self):
+        """Return the brightness show() applies."""
+        return self.getBrightness()
+
+    def physical_strips(self):
+        """Return the physical strips this strip shows on, which is just itself."""
+        return (self,)
+
     def __getitem__(self, key):
         """
         Get pixel color(s) from the strip's background buffer.
@@ -96,12 +181,23 @@ class PhysicalStrip(PixelStrip):
                 key = self.width + key
             if key < 0 or key >= self.width:
                 raise IndexError(f"Pixel index {key} out of range")
-            # Directly call the underlying C method to avoid recursion
-            ws.ws2811_led_set(self._channel, key, color)
+            if self.frame is not None:
+                self.frame[key] = color
+            else:
+                # Directly call the underlying C method to avoid recursion
+                ws.ws2811_led_set(self._channel, key, color)
+            self.background[key] = color
+            if self.touched is not None:
+                self.touched.append(key)
+        elif isinstance(key, slice) and self.frame is not None:
+            # Slice of pixels, numpy buffers take the whole slice at once
+            self.frame[key] = color
             self.background[key] = color
+            self._touch_range(*key.indices(self.width))
         elif isinstance(key, slice):
             # Slice of pixels
             indices = range(*key.indices(self.width))
+            self._touch_range(*key.indices(self.width))
             for i in indices:
                 # Directly call the underlying C method to avoid recursion
                 ws.ws2811_led_set(self._channel, i, color)
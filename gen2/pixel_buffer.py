@@ -0,0 +1,63 @@
+"""
+NumPy pixel buffers for lightymclightshow strips and bulk transfer of
+a whole frame into the rpi_ws281x driver's LED array.
+
+A pixel buffer is a contiguous uint32 ndarray of packed Color() values
+(0xWWRRGGBB), the same layout the driver keeps in its ws2811_led_t
+array, so a frame can go to the driver with a single memory copy
+instead of one ws2811_led_set() call per pixel.
+"""
+
+import ctypes
+
+import numpy as np
+from rpi_ws281x import ws
+
+
+def new_pixel_buffer(width, color=0):
+    """Return a contiguous uint32 pixel buffer of the given width, filled with color."""
+    return np.full(width, color, dtype=np.uint32)
+
+
+def is_pixel_buffer(buffer):
+    """Return True if buffer is a NumPy pixel buffer rather than a list."""
+    return isinstance(buffer, np.ndarray)
+
+
+def channel_view(buffer):
+    """
+    Return an (N, 4) uint8 view of a pixel buffer without copying.
+
+    Writes through the view change the buffer.  On the little-endian Pi
+    the byte columns are in B, G, R, W order.
+    """
+    return buffer.view(np.uint8).reshape(-1, 4)
+
+
+def led_array(channel, count):
+    """
+    Return an ndarray view over the driver's LED array for a channel,
+    or None if the array is not available (e.g. before begin()).
+
+    The view is only valid until the driver reallocates the array, so
+    don't hang on to it across a begin() call.
+    """
+    try:
+        address = int(ws.ws2811_channel_t_leds_get(channel))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not address:
+        return None
+    return np.ctypeslib.as_array((ctypes.c_uint32 * count).from_address(address))
+
+
+def push_to_leds(channel, buffer):
+    """Copy a whole pixel buffer into the driver's LED array for a channel."""
+    leds = led_array(channel, len(buffer))
+    if leds is not None:
+        leds[:] = buffer
+        return
+
+    # No direct access to the driver memory, fall back to one call per pixel
+    for i, color in enumerate(buffer.tolist()):
+        ws.ws2811_led_set(channel, i, color)
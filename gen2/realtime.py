@@ -0,0 +1,244 @@
+"""
+Real-time execution for the frame loop on a busy Pi.
+
+On a Pi that is also running gpsd, logging and an ssh session, the frame
+thread waits its turn for a core like everything else, and whatever runs
+first shows up as frames that go out late.  RealtimeMode gives the frame
+thread and the transmit threads the machine's attention:
+
+    affinity     pins them to chosen cores, ideally ones kept free of
+                 everything else with isolcpus= on the kernel command line
+    SCHED_FIFO   a real-time scheduling class, so they run the moment they
+                 wake, ahead of every ordinary process
+    memory       locks the process's memory with mlockall() and pre-faults
+                 a heap reserve, so no frame ever waits on a page fault or
+                 on being swapped back in
+
+Each step needs privileges the show may not have, root or CAP_SYS_NICE
+and CAP_IPC_LOCK or a raised memlock limit.  A step that isn't permitted
+is left out and reported, and the show runs anyway.  Wakeup latency, how
+late sleeps return, is measured before and after, so the difference can
+be seen in stats() rather than taken on trust.  Measuring takes
+measure milliseconds each side, 0.1 s by default, before the show starts.
+
+Everything is undone by stop(), which the Dispatcher and Engine call when
+run() returns or raises: the frame thread gets back the cores and
+scheduling it had, memory is unlocked and malloc goes back to its
+defaults.  Transmit threads end with the run, so they need nothing undone.
+
+    dispatcher = Dispatcher(realtime=RealtimeMode(frame_cpus={3}))
+"""
+
+import ctypes
+import ctypes.util
+import os
+import time
+
+from frame_stats import RollingHistogram
+
+
+# mlockall() flags and mallopt() parameters, from sys/mman.h and malloc.h
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+M_TRIM_THRESHOLD = -1
+M_MMAP_MAX = -4
+
+# glibc's defaults for those, put back when the show ends
+DEFAULT_TRIM_THRESHOLD = 128 * 1024
+DEFAULT_MMAP_MAX = 65536
+
+
+def _libc():
+    """Return the C library, or None where it can't be loaded."""
+    path = ctypes.util.find_library('c')
+    try:
+        return ctypes.CDLL(path, use_errno=True)
+    except OSError:
+        return None
+
+
+def measure_wakeup_latency(samples=500, interval=0.001):
+    """
+    Sleep interval seconds samples times and return a RollingHistogram of
+    how late each sleep returned, in seconds.  This is real time on
+    purpose, whatever clock the show runs on, since it measures the OS.
+    """
+    latency = RollingHistogram(history=samples)
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        time.sleep(interval)
+        latency.add(time.perf_counter() - t0 - interval)
+    return latency
+
+
+class RealtimeMode:
+    """Pins the frame and transmit threads, schedules them real-time and locks memory."""
+
+    def __init__(self, frame_cpus=None, transmit_cpus=None, priority=50,
+                 transmit_priority=None, lock_memory=True, prefault=32 << 20,
+                 measure=100):
+        """
+        Args:
+            frame_cpus: Cores to pin the frame thread to, None to leave it
+                wherever the OS puts it
+            transmit_cpus: Cores to pin transmit threads to, defaults to
+                frame_cpus
+            priority: SCHED_FIFO priority for the frame thread, 1 to 99,
+                None to leave it in the ordinary scheduling class
+            transmit_priority: SCHED_FIFO priority for transmit threads,
+                defaults to one above priority, so a frame due on the wire
+                goes out ahead of the next one being rendered
+            lock_memory: Lock the process's memory with mlockall() and
+                pre-fault the heap
+            prefault: Bytes of heap to pre-fault and keep, enough for the
+                show's allocations once it is running
+            measure: Wakeup latency samples to take before and after the
+                first start(), at a millisecond each, 0 not to measure
+        """
+        self.frame_cpus = set(frame_cpus) if frame_cpus is not None else None
+        self.transmit_cpus = set(transmit_cpus) if transmit_cpus is not None else self.frame_cpus
+        self.priority = priority
+        if transmit_priority is None and priority is not None:
+            transmit_priority = min(priority + 1, 99)
+        self.transmit_priority = transmit_priority
+        self.lock_memory = lock_memory
+        self.prefault = prefault
+        self.measure = measure
+
+        self.started = False
+        self.memory_locked = False
+        # The frame thread's affinity and scheduling from before start(),
+        # and the C library memory was locked through
+        self._saved = None
+        self._libc = None
+        # What was applied to each kind of thread and every step that
+        # wasn't permitted, for stats()
+        self.applied = {}
+        self.fallbacks = []
+        self.latency_before = None
+        self.latency_after = None
+
+    def _fallback(self, message):
+        """Report a step that couldn't be applied, once."""
+        if message not in self.fallbacks:
+            self.fallbacks.append(message)
+            print(f"Realtime mode: {message}, continuing without it")
+
+    def _apply(self, role, cpus, priority):
+        """Pin and schedule the calling thread as role, 'frame' or 'transmit'."""
+        applied = {'affinity': None, 'policy': 'SCHED_OTHER'}
+
+        # With pid 0 both calls apply to the calling thread only
+        if cpus is not None:
+            try:
+                os.sched_setaffinity(0, cpus)
+                applied['affinity'] = sorted(cpus)
+            except (AttributeError, OSError) as e:
+                self._fallback(f"can't pin {role} thread to cores {sorted(cpus)}: {e}")
+
+        if priority is not None:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+                applied['policy'] = f'SCHED_FIFO {priority}'
+            except AttributeError:
+                self._fallback(f"no SCHED_FIFO for the {role} thread on this platform")
+            except OSError as e:
+                self._fallback(f"can't make the {role} thread SCHED_FIFO {priority} "
+                               f"(needs root or CAP_SYS_NICE): {e}")
+
+        self.applied[role] = applied
+
+    def _lock_memory(self):
+        """Lock the process's memory and pre-fault a heap reserve that malloc keeps."""
+        libc = _libc()
+        if libc is None or not hasattr(libc, 'mlockall'):
+            self._fallback("no mlockall() on this platform, memory not locked")
+            return
+
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            error = ctypes.get_errno()
+            self._fallback(f"can't lock memory (needs root, CAP_IPC_LOCK or a larger "
+                           f"memlock limit): {os.strerror(error)}")
+            return
+        self.memory_locked = True
+        self._libc = libc
+
+        if not self.prefault:
+            return
+        try:
+            # Never give heap back to the OS or serve big blocks from
+            # fresh mappings, either would fault in new pages mid show
+            libc.mallopt(M_TRIM_THRESHOLD, -1)
+            libc.mallopt(M_MMAP_MAX, 0)
+        except AttributeError:
+            self._fallback("no mallopt() in this C library, heap not pre-faulted")
+            return
+        libc.malloc.restype = ctypes.c_void_p
+        libc.free.argtypes = [ctypes.c_void_p]
+        reserve = libc.malloc(self.prefault)
+        if reserve:
+            # Touch every page, then free it back to malloc, which keeps it
+            ctypes.memset(reserve, 0, self.prefault)
+            libc.free(reserve)
+
+    def _save_thread(self):
+        """Remember the calling thread's affinity and scheduling, where the platform has them."""
+        try:
+            self._saved = (os.sched_getaffinity(0), os.sched_getscheduler(0),
+                           os.sched_getparam(0))
+        except (AttributeError, OSError):
+            self._saved = None
+
+    def start(self):
+        """
+        Make the calling thread the frame thread and lock memory, until
+        stop().  The first time also measures wakeup latency either side.
+        """
+        if self.measure and self.latency_before is None:
+            self.latency_before = measure_wakeup_latency(self.measure)
+        self._save_thread()
+        if self.lock_memory and not self.memory_locked:
+            self._lock_memory()
+        self._apply('frame', self.frame_cpus, self.priority)
+        self.started = True
+        if self.measure and self.latency_after is None:
+            self.latency_after = measure_wakeup_latency(self.measure)
+
+    def stop(self):
+        """Give the calling thread back the cores and scheduling it had before start() and unlock memory."""
+        if self._saved is not None:
+            cpus, policy, param = self._saved
+            self._saved = None
+            try:
+                os.sched_setscheduler(0, policy, param)
+                os.sched_setaffinity(0, cpus)
+            except OSError as e:
+                print(f"Realtime mode: can't restore the frame thread's scheduling: {e}")
+
+        if self.memory_locked:
+            libc = self._libc
+            libc.munlockall()
+            try:
+                libc.mallopt(M_TRIM_THRESHOLD, DEFAULT_TRIM_THRESHOLD)
+                libc.mallopt(M_MMAP_MAX, DEFAULT_MMAP_MAX)
+            except AttributeError:
+                pass
+            self.memory_locked = False
+        self.started = False
+
+    def transmit_thread_started(self):
+        """Thread start hook for transmit threads, pins and schedules the calling thread."""
+        self._apply('transmit', self.transmit_cpus, self.transmit_priority)
+
+    def stats(self):
+        """Return what was applied, what fell back and wakeup latency before and after in microseconds."""
+        result = {
+            'threads': dict(self.applied),
+            'memory_locked': self.memory_locked,
+            'fallbacks': list(self.fallbacks),
+        }
+        if self.latency_before is not None:
+            result['wakeup_latency_before_us'] = self.latency_before.summary(scale=1e6)
+        if self.latency_after is not None:
+            result['wakeup_latency_after_us'] = self.latency_after.summary(scale=1e6)
+        return result
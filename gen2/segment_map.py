@@ -0,0 +1,127 @@
+"""
+Run-length map from logical pixels to physical strip pixels.
+
+A logical strip is usually built from a handful of long runs of
+consecutive physical pixels, so instead of one (strip, index) entry per
+pixel we keep one Segment per run and move pixels a whole run at a time.
+"""
+
+from bisect import bisect_right
+
+
+class Segment:
+    """A run of consecutive physical pixels mapped onto a logical strip."""
+
+    __slots__ = ('strip', 'start', 'direction', 'length', 'offset')
+
+    def __init__(self, strip, start, direction, length, offset):
+        """
+        Args:
+            strip: The physical strip the run lives on
+            start: Physical index of the first pixel in the run
+            direction: 1 if physical indices count up, -1 if they count down
+            length: Number of pixels in the run
+            offset: Logical index of the first pixel in the run
+        """
+        self.strip = strip
+        self.start = start
+        self.direction = direction
+        self.length = length
+        self.offset = offset
+
+    @property
+    def end(self):
+        """Physical index of the last pixel in the run (inclusive)."""
+        return self.start + self.direction * (self.length - 1)
+
+    def physical_slice(self, first=0, count=None):
+        """
+        Return a slice of the physical strip covering count pixels of the
+        run starting first pixels into it, in logical order.
+        """
+        if count is None:
+            count = self.length - first
+        begin = self.start + self.direction * first
+        if self.direction > 0:
+            return slice(begin, begin + count)
+        stop = begin - count
+        return slice(begin, stop if stop >= 0 else None, -1)
+
+    def __repr__(self):
+        return f"Segment({self.strip!r}, {self.start}..{self.end}, offset={self.offset})"
+
+
+class SegmentMap:
+    """Maps logical pixel indices onto a list of physical Segments."""
+
+    def __init__(self):
+        self.segments = []
+        self.width = 0
+
+        # Logical offset of each segment, for bisecting a pixel to its segment
+        self._offsets = []
+
+    def add_range(self, strip, start_pixel, end_pixel):
+        """
+        Append physical pixels start_pixel..end_pixel (inclusive) of strip.
+        The range runs backwards if start_pixel > end_pixel.  A range that
+        continues the previous segment is merged into it.
+        """
+        direction = 1 if start_pixel <= end_pixel else -1
+        length = abs(end_pixel - start_pixel) + 1
+
+        if self.segments:
+            last = self.segments[-1]
+            if last.strip is strip and last.direction == direction \
+               and last.end + direction == start_pixel:
+                last.length += length
+                self.width += length
+                return
+
+        self.segments.append(Segment(strip, start_pixel, direction, length, self.width))
+        self._offsets.append(self.width)
+        self.width += length
+
+    def locate(self, n):
+        """Return (strip, physical_index) for logical pixel n."""
+        segment = self.segments[bisect_right(self._offsets, n) - 1]
+        return segment.strip, segment.start + segment.direction * (n - segment.offset)
+
+    def _runs(self, start, stop):
+        """Yield (segment, first, count) for the parts of segments covering logical start..stop-1."""
+        i = bisect_right(self._offsets, start) - 1
+        while i < len(self.segments) and start < stop:
+            segment = self.segments[i]
+            first = start - segment.offset
+            count = min(segment.length - first, stop - start)
+            yield segment, first, count
+            start += count
+            i += 1
+
+    def copy(self, buffer):
+        """Copy a logical pixel buffer onto the physical strips, one slice per segment."""
+        for segment in self.segments:
+            source = buffer[segment.offset:segment.offset + segment.length]
+            frame = getattr(segment.strip, 'frame', None)
+            if frame is not None:
+                frame[segment.physical_slice()] = source
+            else:
+                # The strip has no frame buffer, go through it a pixel at a time
+                set_pixel = segment.strip.setPixelColor
+                physical_idx = segment.start
+                for color in source:
+                    set_pixel(physical_idx, color)
+                    physical_idx += segment.direction
+
+    def fill(self, start, stop, color):
+        """Set logical pixels start..stop-1 to color on the physical strips."""
+        for segment, first, count in self._runs(start, stop):
+            frame = getattr(segment.strip, 'frame', None)
+            if frame is not None:
+                frame[segment.physical_slice(first, count)] = color
+            else:
+                set_pixel = segment.strip.setPixelColor
+                physical_idx = segment.start + segment.direction * first
+                for _ in range(count):
+                    set_pixel(physical_idx, color)
+                    physical_idx += segment.direction
@@ -0,0 +1,294 @@
+"""
+Sharded rendering across worker processes.
+
+One Python process stepping every effect on every strip only gets one of
+the Pi's four cores.  A ShardedDispatcher splits the physical strips into
+shards, each rendered by its own worker process running an ordinary
+Dispatcher, so the existing Effect classes work unchanged.
+
+Each physical strip gets a shared memory block holding two frames.  In
+the worker the strip is a BufferStrip over that block, and the worker's
+setup function builds logical strips and schedules effects on it just
+as a show script would on the real hardware.  The main process owns the
+hardware.  Every frame it hands all the workers the same (now,
+virtual_now) from the master clock, sends the previous frame from shared
+memory while they render the next one into the other half, then waits
+for all of them before moving on, so the shards never drift apart.
+
+Setup functions should be module level functions so they can be passed
+to the workers under any multiprocessing start method.
+"""
+
+import multiprocessing
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import clock
+from buffer_strip import BufferStrip
+from clock import ManualClock, set_clock
+from dispatcher import Dispatcher
+from frame_commit import FrameCommit
+from frame_pacing import FramePacer
+from frame_stats import RollingHistogram
+
+
+class Shard:
+    """A group of physical strips rendered by one worker process."""
+
+    def __init__(self, setup, strips, name=None):
+        """
+        Args:
+            setup: Callable run in the worker as setup(dispatcher, strips),
+                where strips maps the same names to BufferStrips.  It
+                builds any logical strips and schedules the effects.
+            strips: Dict mapping names to the physical strips the shard
+                renders
+            name: Name for statistics, defaults to the setup function's
+        """
+        self.setup = setup
+        self.strips = dict(strips)
+        self.name = name or getattr(setup, '__name__', 'shard')
+
+        # Set up by ShardedDispatcher.start()
+        self.process = None
+        self.conn = None
+        self.render_time = RollingHistogram()
+
+
+def _shard_worker(conn, setup, layout, fps, start_time):
+    """
+    Worker process main loop.  layout is a list of (name, shared memory
+    name, width) for the shard's strips, start_time the master clock time
+    the show starts at.
+    """
+    blocks = []
+    strips = {}
+    for name, shm_name, width in layout:
+        block = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(block)
+        frames = np.ndarray((2, width), dtype=np.uint32, buffer=block.buf)
+        strips[name] = BufferStrip(width, frames=(frames[0], frames[1]), name=name)
+    names = {strip: name for name, strip in strips.items()}
+
+    # The worker's clock is whatever the master says it is, starting from
+    # the show's start so effects setup starts and events it schedules
+    # are on the master's timebase
+    worker_clock = ManualClock(start_time)
+    set_clock(worker_clock)
+    dispatcher = Dispatcher(fps=fps, time_source=worker_clock)
+    dispatcher.start_time = start_time
+    try:
+        setup(dispatcher, strips)
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+        return
+
+    try:
+        while True:
+            command = conn.recv()
+            if command[0] == 'stop':
+                break
+            _, now, virtual_now, index = command
+
+            try:
+                t0 = time.perf_counter()
+                worker_clock.set(now)
+                for strip in strips.values():
+                    if strip.frame_index != index:
+                        strip.flip()
+                dispatcher.run_events(virtual_now, now)
+                updated, _ = dispatcher.frame_commit.resolve(dispatcher.render_frame(now))
+                updated = set(updated)
+                for strip in strips.values():
+                    if strip.shown:
+                        updated.add(strip)
+                        strip.shown = False
+                elapsed = time.perf_counter() - t0
+            except Exception:
+                conn.send(('error', traceback.format_exc()))
+                break
+
+            conn.send(('done', [names[strip] for strip in updated], dispatcher.is_active(), elapsed))
+    finally:
+        # The numpy views have to go before the blocks can be closed
+        del dispatcher, strips, names
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass
+
+
+class ShardedDispatcher:
+    """Runs shards of strips in worker processes on one master clock and shows them."""
+
+    def __init__(self, shards, fps=100, skip_unchanged=True, keepalive=None,
+                 overrun='drop', parallel_transmit=False, time_source=None):
+        """
+        Args:
+            shards: List of Shards, no physical strip may be in two of them
+            fps: Target frame rate
+            skip_unchanged: Don't retransmit strips whose pixels haven't
+                changed since they were last sent
+            keepalive: Resend unchanged strips anyway every this many
+                seconds (None for never)
+            overrun: 'drop' or 'resync' when a frame runs past its
+                deadline, see FramePacer
+            parallel_transmit: Send all the physical strips of a frame at
+                once, one thread per strip
+            time_source: Clock to run the show on, process-global as for
+                Dispatcher and installed by start().  The workers follow it.
+        """
+        self.time_source = time_source
+
+        seen = set()
+        for shard in shards:
+            for strip in shard.strips.values():
+                if strip in seen:
+                    raise ValueError(f"Strip {strip!r} is in more than one shard")
+                seen.add(strip)
+
+        self.shards = list(shards)
+        self.fps = fps
+        self.pacer = FramePacer(fps, overrun=overrun)
+        self.frame_commit = FrameCommit(skip_unchanged=skip_unchanged, keepalive=keepalive,
+                                        parallel=parallel_transmit)
+
+        self.frame_count = 0
+        self.start_time = None
+        # Time the main process spent waiting on the slowest shard
+        self.wait_time = RollingHistogram()
+
+        # (shard, name) -> (hardware strip, (frame 0 view, frame 1 view))
+        self._outputs = {}
+        self._blocks = []
+
+    def start(self):
+        """
+        Create the shared frame buffers and start the worker processes,
+        with the show starting now.
+        """
+        if self.time_source is not None:
+            set_clock(self.time_source)
+        self.start_time = clock.now()
+        context = multiprocessing.get_context()
+        for shard in self.shards:
+            layout = []
+            for name, strip in shard.strips.items():
+                block = shared_memory.SharedMemory(create=True, size=2 * strip.width * 4)
+                self._blocks.append(block)
+                frames = np.ndarray((2, strip.width), dtype=np.uint32, buffer=block.buf)
+                frames.fill(0)
+                self._outputs[(shard, name)] = (strip, (frames[0], frames[1]))
+                layout.append((name, block.name, strip.width))
+
+            shard.conn, child_conn = context.Pipe()
+            shard.process = context.Process(target=_shard_worker, name=f"shard-{shard.name}",
+                                            args=(child_conn, shard.setup, layout, self.fps, self.start_time),
+                                            daemon=True)
+            shard.process.start()
+            child_conn.close()
+
+    def _collect(self, index):
+        """
+        Wait for every shard to finish frame index, return the physical
+        strips to send, their shared frames, and whether any shard still
+        has work to do.
+        """
+        physical = []
+        buffers = {}
+        active = False
+        for shard in self.shards:
+            reply = shard.conn.recv()
+            if reply[0] == 'error':
+                raise RuntimeError(f"Shard {shard.name} failed:\n{reply[1]}")
+            _, names, shard_active, elapsed = reply
+            shard.render_time.add(elapsed)
+            active = active or shard_active
+            for name in names:
+                strip, frames = self._outputs[(shard, name)]
+                physical.append(strip)
+                buffers[strip] = frames[index]
+        return physical, buffers, active
+
+    def run(self, duration=None):
+        """
+        Run the shards until none of them has anything left to do.  The
+        workers are stopped and the shared buffers freed when it returns,
+        or raises, a later run() starts them over.
+        duration: Run for this many seconds, or forever if None
+        """
+        if not self._blocks:
+            self.start()
+        elif self.time_source is not None:
+            set_clock(self.time_source)
+
+        self.pacer.start()
+        # The frame rendered last time round, sent while the next renders
+        pending = None
+        index = 0
+
+        try:
+            while True:
+                now = clock.now()
+                virtual_now = now - self.start_time
+                for shard in self.shards:
+                    shard.conn.send(('frame', now, virtual_now, index))
+
+                if pending is not None:
+                    self.frame_commit.send_all(pending[0], buffers=pending[1])
+
+                t0 = time.perf_counter()
+                physical, buffers, active = self._collect(index)
+                self.wait_time.add(time.perf_counter() - t0)
+                pending = (physical, buffers)
+                index ^= 1
+
+                self.pacer.wait()
+                self.frame_count += 1
+
+                if duration and (clock.now() - self.start_time) >= duration:
+                    break
+                if not active:
+                    break
+
+            # Show the last frame
+            self.frame_commit.send_all(pending[0], buffers=pending[1])
+        finally:
+            self.frame_commit.close()
+            # Nothing else would stop the workers or unlink their /dev/shm blocks
+            self.close()
+
+    def close(self):
+        """Stop the worker processes and free the shared frame buffers."""
+        for shard in self.shards:
+            if shard.process is None:
+                continue
+            try:
+                shard.conn.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
+            shard.process.join(timeout=5)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.conn.close()
+            shard.process = None
+
+        self._outputs = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def stats(self):
+        """Return frame, commit, pacing and per-shard render time statistics, times in milliseconds."""
+        return {
+            'frames': self.frame_count,
+            'commit': self.frame_commit.stats(),
+            'pacing': self.pacer.stats(),
+            'shard_wait': self.wait_time.summary(scale=1000.0),
+            'shards': {shard.name: shard.render_time.summary(scale=1000.0) for shard in self.shards},
+        }
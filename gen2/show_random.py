@@ -0,0 +1,54 @@
+"""
+Seeded random numbers for effects.
+
+Effects that use randomness draw from their own numpy Generator, self.rng.
+A Dispatcher made with a seed holds a ShowSeed, and as each effect is
+first run it gets a Generator derived from the show seed and the effect's
+identity: its class name and how many effects of that class the
+Dispatcher ran before it.  Two controllers that run the same show script
+with the same seed and step their effects at the same times (on a shared
+ExternalClock, say) render bit-identical frames, so keeping them in step
+only takes the seed and the show position rather than streaming the
+frames.
+
+Every Dispatcher keeps its own ShowSeed, so a second one in the same
+process doesn't disturb the first one's streams.  Effects not run by a
+seeded Dispatcher keep a Generator seeded from the OS, as random was.
+"""
+
+import zlib
+
+import numpy as np
+
+
+class ShowSeed:
+    """A show seed, handing out a Generator for each effect and any other named stream."""
+
+    def __init__(self, seed):
+        """
+        Args:
+            seed: The show seed, an int
+        """
+        self.seed = seed
+        self.sequence = np.random.SeedSequence(seed)
+        # Effects handed a stream so far, by class name
+        self._created = {}
+
+    def rng_for(self, *identity):
+        """
+        Return a numpy Generator for the stream identified by identity, any
+        mix of strings and ints, under the show seed.
+        """
+        key = [zlib.crc32(part.encode()) if isinstance(part, str) else part for part in identity]
+        return np.random.default_rng(np.random.SeedSequence(self.sequence.entropy, spawn_key=key))
+
+    def effect_rng(self, kind):
+        """Return the Generator for the next effect of class name kind."""
+        index = self._created.get(kind, 0)
+        self._created[kind] = index + 1
+        return self.rng_for(kind, index)
+
+
+def unseeded_rng():
+    """Return a Generator seeded from the OS, for an effect no seeded Dispatcher has run."""
+    return np.random.default_rng()
@@ -54,7 +54,7 @@ def run_demo(strip):
             ))
     
     # 25.0s: Final blackout
-    dispatcher.schedule(25.0, lambda: strip.blackout())
+    dispatcher.schedule(25.0, lambda: dispatcher.blackout(strip))
     
     # --- Run the animation ---
     # The dispatcher will now run until all scheduled events and effects are complete.
@@ -19,12 +19,13 @@ LED_BRIGHTNESS = 128  # Set to 0 for darkest and 255 for brightest
 LED_INVERT = False    # True to invert the signal (when using NPN transistor level shift)
 LED_CHANNEL = 0       # set to '1' for GPIOs 13, 19, 41, 45 or 53, leave at 0 for SPI
 LED_STRIP_TYPE = ws.WS2811_STRIP_RGB
+LED_BUFFER_MODE = 'numpy'  # 'numpy' pushes each frame to the driver in one bulk copy, 'list' is per pixel
 
 def initialize_strips():
     # Create NeoPixel objects for both strips
     strips = []
     for pin in LED_PINS:
-        strip = PhysicalStrip(LED_COUNT, pin, LED_FREQ_HZ, LED_DMA, LED_INVERT, LED_BRIGHTNESS, LED_CHANNEL, strip_type=LED_STRIP_TYPE)
+        strip = PhysicalStrip(LED_COUNT, pin, LED_FREQ_HZ, LED_DMA, LED_INVERT, LED_BRIGHTNESS, LED_CHANNEL, strip_type=LED_STRIP_TYPE, buffer_mode=LED_BUFFER_MODE)
         # Initialize the library (must be called once before other functions)
         strip.begin()
         strips.append(strip)
@@ -4,23 +4,41 @@ lightymclightshow background buffer and any other meta stuff.
 """
 
 from rpi_ws281x import Color
+from pixel_buffer import new_pixel_buffer, channel_view, led_array, push_to_leds
+from dirty_tracking import DirtyTrackingMixin
+from touch_tracking import TouchTrackingMixin
 
 
-class Strip:
+class Strip(DirtyTrackingMixin, TouchTrackingMixin):
     """Encapsulates a physical LED strip and its background buffer."""
 
-    def __init__(self, physical_strip):
+    def __init__(self, physical_strip, buffer_mode='list'):
         """
         Initialize a Strip with a physical LED strip.
 
         Args:
             physical_strip: An rpi_ws281x PixelStrip object
+            buffer_mode: 'list' or 'numpy', see PhysicalStrip
         """
+        if buffer_mode not in ('list', 'numpy'):
+            raise ValueError(f"Unknown buffer mode {buffer_mode!r}, expected 'list' or 'numpy'")
+
         self.strip = physical_strip
         self.width = physical_strip.numPixels()
 
-        # Background buffer - what pixels return to each frame
-        self.background = [Color(0, 0, 0)] * self.width
+        # Background buffer - what pixels return to each frame, and in
+        # numpy mode the frame being rendered
+        if buffer_mode == 'numpy':
+            self.background = new_pixel_buffer(self.width)
+            self.frame = new_pixel_buffer(self.width)
+        else:
+            self.background = [Color(0, 0, 0)] * self.width
+            self.frame = None
+
+    @property
+    def background_u8(self):
+        """An (N, 4) uint8 view of the numpy background buffer, no copy."""
+        return channel_view(self.background)
 
     def blackout(self):
         """ blackout all the pixels in the background array
@@ -32,26 +50,71 @@ class Strip:
     def set_background(self, r=0, g=0, b=0):
         """Set all background pixels to a specific color."""
         color = Color(r, g, b)
-        self.background[:] = [color] * self.width
+        if self.frame is not None:
+            self.background.fill(color)
+        else:
+            self.background[:] = [color] * self.width
+        self._touch_all()
 
     def copy_background_to_strip(self):
         """Copy the background buffer to the physical strip."""
+        self._touch_all()
+        if self.frame is not None:
+            self.frame[:] = self.background
+            return
         for i in range(self.width):
             self.strip.setPixelColor(i, self.background[i])
 
     def copy_color_to_strip(self, r=0, g=0, b=0):
         """Copy a specific color to the physical strip."""
         color = Color(r, g, b)
+        self._touch_all()
+        if self.frame is not None:
+            self.frame.fill(color)
+            return
         for i in range(self.width):
             self.strip.setPixelColor(i, color)
 
     def show(self):
-        """Update the physical strip to show the current pixel values."""
+        """
+        Update the physical strip to show the current pixel values.
+        In numpy mode the whole frame is handed over in one bulk copy first.
+        """
+        self._transmit(self.frame_digest())
+
+    def _transmit(self, digest, pixels=None):
+        """Send the frame, or pixels if given, to the wire and record it as the last one sent."""
+        if pixels is None:
+            pixels = self.frame
+        if pixels is not None:
+            if getattr(self.strip, 'frame', None) is not None:
+                # Wrapping a numpy mode PhysicalStrip, it pushes its own frame
+                self.strip.frame[:] = pixels
+            else:
+                push_to_leds(self.strip._channel, pixels)
         self.strip.show()
+        self._mark_sent(digest)
+
+    def wire_pixels(self):
+        """Return the pixels show() sends as a uint32 array, or None if unreadable."""
+        if self.frame is not None:
+            return self.frame
+        if getattr(self.strip, 'frame', None) is not None:
+            return self.strip.frame
+        return led_array(self.strip._channel, self.width)
+
+    def wire_brightness(self):
+        """Return the brightness show() applies."""
+        return self.strip.getBrightness()
 
     def setPixelColor(self, n, color):
         """Set a pixel color directly on the physical strip."""
-        self.strip.setPixelColor(n, color)
+        if self.frame is not None:
+            self.frame[n] = color
+        else:
+            self.strip.setPixelColor(n, color)
+        if self.touched is not None:
+            self.touched.append(n)
 
     def numPixels(self):
         """Return the number of pixels in the strip."""
@@ -61,6 +124,10 @@ class Strip:
         """Return the number of pixels in the strip."""
         return self.width
 
+    def physical_strips(self):
+        """Return the physical strips this strip shows on, which is just itself."""
+        return (self,)
+
     def __getitem__(self, key):
         """
         Get pixel color(s) from the strip's background buffer.
@@ -97,6 +164,11 @@ class Strip:
                 raise IndexError(f"Pixel index {key} out of range")
             self.setPixelColor(key, color)
             self.background[key] = color
+        elif isinstance(key, slice) and self.frame is not None:
+            # Slice of pixels, numpy buffers take the whole slice at once
+            self.frame[key] = color
+            self.background[key] = color
+            self._touch_range(*key.indices(self.width))
         elif isinstance(key, slice):
             # Slice of pixels
             indices = range(*key.indices(self.width))
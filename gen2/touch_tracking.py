@@ -0,0 +1,77 @@
+"""
+Touched pixel tracking for strips.
+
+Foreground effects usually draw a handful of pixels, so rather than
+repainting a whole strip from the background (or black) before every
+frame, the Dispatcher has the strip remember which frame pixels were
+written since its last repaint and puts back just those.  Bulk writes
+(copying the background, filling with a color, changing the
+background) mark the whole strip as touched, so the next repaint is a
+full one.
+"""
+
+import numpy as np
+
+
+class TouchTrackingMixin:
+    """
+    Mixin for strip classes.  The class calls _touch_range() and
+    _touch_all() from its writers, or appends to touched directly on hot
+    paths, and this provides the restore.
+    """
+
+    # Frame pixels written since the last repaint, None when not tracking
+    touched = None
+
+    # True if the whole frame or the background was rewritten since
+    touched_all = False
+
+    def track_touches(self):
+        """Start recording written pixels, as of a frame that has just been fully repainted."""
+        self.touched = []
+        self.touched_all = False
+
+    def untrack_touches(self):
+        """Stop recording written pixels."""
+        self.touched = None
+        self.touched_all = False
+
+    def _touch_range(self, start, stop, step=1):
+        touched = self.touched
+        if touched is not None:
+            touched.extend(range(start, stop, step))
+
+    def _touch_all(self):
+        if self.touched is not None:
+            self.touched_all = True
+
+    def restore_touched(self, from_background=True):
+        """
+        Put the frame pixels written since the last repaint back to the
+        background, or to black.  Returns False without doing anything if
+        the whole strip has to be repainted instead.
+        """
+        touched = self.touched
+        if touched is None or self.touched_all:
+            return False
+        if touched:
+            # Don't record our own writes
+            self.touched = None
+            self._restore_pixels(touched, from_background)
+            touched.clear()
+            self.touched = touched
+        return True
+
+    def _restore_pixels(self, indices, from_background):
+        frame = getattr(self, 'frame', None)
+        if frame is not None:
+            indices = np.fromiter(indices, dtype=np.intp, count=len(indices))
+            if from_background:
+                frame[indices] = self.background[indices]
+            else:
+                frame[indices] = 0
+            return
+
+        background = self.background
+        for i in set(indices):
+            self.setPixelColor(i, background[i] if from_background else 0)
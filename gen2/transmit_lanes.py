@@ -0,0 +1,128 @@
+"""
+Parallel transmit of several physical strips.
+
+Each physical strip gets its own lane: a dedicated thread that sends the
+strip to the wire.  Every frame all the lanes are released together and
+the frame loop waits on a barrier until all of them are done, so strips
+on different interfaces (PWM and SPI, say) latch the same frame at the
+same time and a frame costs the slowest lane's wire time rather than the
+sum of all of them.  The rpi_ws281x render call releases the GIL while
+it waits on the hardware, so the lanes really do overlap.
+"""
+
+import threading
+import time
+
+
+class _Lane(threading.Thread):
+    """A thread that transmits one physical strip each time the lanes are released."""
+
+    def __init__(self, lanes, strip):
+        super().__init__(name=f"transmit-lane-{len(lanes.lanes)}", daemon=True)
+        self.lanes = lanes
+        self.strip = strip
+
+        # Set by the frame loop before releasing the lanes
+        self.pending = False
+        self.pixels = None
+
+        # Filled in by the lane for the frame loop
+        self.sent = False
+        self.elapsed = 0.0
+        self.error = None
+
+    def run(self):
+        lanes = self.lanes
+        if lanes.on_thread_start is not None:
+            lanes.on_thread_start()
+        while True:
+            try:
+                lanes._start.wait()
+            except threading.BrokenBarrierError:
+                return
+            if lanes._closing:
+                return
+            if self.pending:
+                t0 = time.perf_counter()
+                try:
+                    self.sent = lanes.send(self.strip, self.pixels)
+                except BaseException as e:
+                    self.error = e
+                self.elapsed = time.perf_counter() - t0
+            try:
+                lanes._done.wait()
+            except threading.BrokenBarrierError:
+                return
+
+
+class TransmitLanes:
+    """Sends a set of physical strips to the wire at the same time, one thread per strip."""
+
+    def __init__(self, send, on_thread_start=None):
+        """
+        Args:
+            send: Callable taking a physical strip and an optional pixel
+                array to send in place of its frame, sending it to the wire
+                and returning True if it was actually sent
+            on_thread_start: Optional callable run first thing in each new
+                lane thread, to pin or prioritize it say, see RealtimeMode
+        """
+        self.send = send
+        self.on_thread_start = on_thread_start
+        self.lanes = {}
+        self._start = None
+        self._done = None
+        self._closing = False
+
+    def _build(self, strips):
+        """(Re)start the lane threads so there is one per strip."""
+        lane_strips = list(self.lanes) + [strip for strip in strips if strip not in self.lanes]
+        self.close()
+        self._closing = False
+
+        self._start = threading.Barrier(len(lane_strips) + 1)
+        self._done = threading.Barrier(len(lane_strips) + 1)
+        self.lanes = {}
+        for strip in lane_strips:
+            self.lanes[strip] = _Lane(self, strip)
+        for lane in self.lanes.values():
+            lane.start()
+
+    def transmit(self, strips, buffers=None):
+        """
+        Send all the strips at once and wait for every one to finish.
+        buffers optionally maps strips to pixel arrays to send in place of
+        their frames.
+        Returns a list of (strip, sent, elapsed_seconds).
+        """
+        if any(strip not in self.lanes for strip in strips):
+            self._build(strips)
+
+        wanted = set(strips)
+        for strip, lane in self.lanes.items():
+            lane.pending = strip in wanted
+            lane.pixels = buffers.get(strip) if buffers else None
+            lane.sent = False
+            lane.error = None
+
+        self._start.wait()
+        self._done.wait()
+
+        results = []
+        for strip in strips:
+            lane = self.lanes[strip]
+            if lane.error is not None:
+                raise lane.error
+            results.append((strip, lane.sent, lane.elapsed))
+        return results
+
+    def close(self):
+        """Stop all the lane threads."""
+        if not self.lanes:
+            return
+        self._closing = True
+        self._start.abort()
+        self._done.abort()
+        for lane in self.lanes.values():
+            lane.join()
+        self.lanes = {}